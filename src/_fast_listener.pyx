@@ -0,0 +1,223 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled receive loop and latency statistics for the multicast listener.
+
+Build in place with: cythonize -3 -i src/_fast_listener.pyx
+"""
+from libc.stdint cimport int64_t, uint64_t
+from libc.errno cimport errno, EINTR
+from libc.math cimport sqrt
+from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from cpython.exc cimport PyErr_CheckSignals
+from posix.time cimport clock_gettime, timespec, CLOCK_REALTIME
+import os
+import time
+
+cdef extern from "<sys/socket.h>":
+    ctypedef unsigned int socklen_t
+    struct sockaddr:
+        pass
+    ssize_t recvfrom(int fd, void *buf, size_t n, int flags, sockaddr *addr, socklen_t *addr_len) nogil
+
+# Binary message layout '!QIhhB', only send_time is needed for latency
+DEF MSG_SIZE = 17
+DEF RECV_BUFFER_SIZE = 2048
+
+
+cdef inline uint64_t _load_be64(const unsigned char *p) noexcept nogil:
+    return ((<uint64_t>p[0] << 56) | (<uint64_t>p[1] << 48) | (<uint64_t>p[2] << 40) |
+            (<uint64_t>p[3] << 32) | (<uint64_t>p[4] << 24) | (<uint64_t>p[5] << 16) |
+            (<uint64_t>p[6] << 8) | <uint64_t>p[7])
+
+
+cdef inline int64_t _now_ns() noexcept nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_REALTIME, &ts)
+    return <int64_t>ts.tv_sec * 1000000000 + ts.tv_nsec
+
+
+cdef extern from *:
+    # GCC/Clang 128-bit integer for exact window sums
+    ctypedef long long int128_t "__int128"
+
+# Latencies at least this large (about 18 minutes) are left out of the exact
+# sum of squares, which could otherwise overflow 128 bits
+DEF WIDE_LATENCY = 1 << 40
+
+
+cdef class CLatencyStats:
+    """Latency statistics over a sliding window, kept in a C ring buffer.
+
+    Drop-in replacement for LatencyStats: exact running sums and monotonic
+    min/max deques held in C arrays are updated on every add, so both
+    add_latency() and get_stats() are O(1). While the window holds a
+    latency of 2**40 ns or more, get_stats() scans the window for the
+    standard deviation instead.
+    """
+    cdef int64_t *_window
+    cdef Py_ssize_t _cursor
+    cdef Py_ssize_t _count
+    cdef int128_t _sum
+    cdef int128_t _sumsq
+    cdef Py_ssize_t _wide
+    # Monotonic deques of (add index, latency), as rings of window_size entries
+    cdef int64_t *_min_idx
+    cdef int64_t *_min_val
+    cdef int64_t *_max_idx
+    cdef int64_t *_max_val
+    cdef Py_ssize_t _min_head, _min_len, _max_head, _max_len
+    cdef int64_t _added
+    cdef readonly Py_ssize_t window_size
+    cdef public long long message_count
+    cdef public long long start_time
+
+    def __cinit__(self, Py_ssize_t window_size=100):
+        self._window = <int64_t *>PyMem_Malloc(window_size * sizeof(int64_t))
+        self._min_idx = <int64_t *>PyMem_Malloc(window_size * sizeof(int64_t))
+        self._min_val = <int64_t *>PyMem_Malloc(window_size * sizeof(int64_t))
+        self._max_idx = <int64_t *>PyMem_Malloc(window_size * sizeof(int64_t))
+        self._max_val = <int64_t *>PyMem_Malloc(window_size * sizeof(int64_t))
+        if (self._window == NULL or self._min_idx == NULL or self._min_val == NULL or
+                self._max_idx == NULL or self._max_val == NULL):
+            raise MemoryError()
+        self.window_size = window_size
+        self.start_time = time.time_ns()
+
+    def __dealloc__(self):
+        PyMem_Free(self._window)
+        PyMem_Free(self._min_idx)
+        PyMem_Free(self._min_val)
+        PyMem_Free(self._max_idx)
+        PyMem_Free(self._max_val)
+
+    cpdef add_latency(self, int64_t latency_ns):
+        """Add a new latency measurement."""
+        cdef int64_t evicted
+        cdef Py_ssize_t size = self.window_size
+        cdef Py_ssize_t tail
+        cdef int64_t index = self._added
+
+        if self._count == size:
+            evicted = self._window[self._cursor]
+            self._sum -= evicted
+            if -WIDE_LATENCY < evicted < WIDE_LATENCY:
+                self._sumsq -= <int128_t>evicted * evicted
+            else:
+                self._wide -= 1
+        else:
+            self._count += 1
+        self._window[self._cursor] = latency_ns
+        self._sum += latency_ns
+        if -WIDE_LATENCY < latency_ns < WIDE_LATENCY:
+            self._sumsq += <int128_t>latency_ns * latency_ns
+        else:
+            self._wide += 1
+        self._cursor += 1
+        if self._cursor == size:
+            self._cursor = 0
+
+        # Drop deque entries that slide out of the window, then keep them monotonic
+        if self._min_len and self._min_idx[self._min_head] <= index - size:
+            self._min_head = (self._min_head + 1) % size
+            self._min_len -= 1
+        while self._min_len and self._min_val[(self._min_head + self._min_len - 1) % size] >= latency_ns:
+            self._min_len -= 1
+        tail = (self._min_head + self._min_len) % size
+        self._min_idx[tail] = index
+        self._min_val[tail] = latency_ns
+        self._min_len += 1
+
+        if self._max_len and self._max_idx[self._max_head] <= index - size:
+            self._max_head = (self._max_head + 1) % size
+            self._max_len -= 1
+        while self._max_len and self._max_val[(self._max_head + self._max_len - 1) % size] <= latency_ns:
+            self._max_len -= 1
+        tail = (self._max_head + self._max_len) % size
+        self._max_idx[tail] = index
+        self._max_val[tail] = latency_ns
+        self._max_len += 1
+
+        self._added += 1
+        self.message_count += 1
+
+    cdef double _std(self):
+        """Sample standard deviation of the window."""
+        cdef Py_ssize_t i
+        cdef Py_ssize_t n = self._count
+        cdef long double mean, deviation, squares = 0
+        if n < 2:
+            return 0
+        if not self._wide:
+            # Sample variance: (n*sum(x^2) - sum(x)^2) / (n*(n-1)), exact up to the division
+            return sqrt(<double>(<long double>(n * self._sumsq - self._sum * self._sum) / (<long double>n * (n - 1))))
+        mean = <long double>self._sum / n
+        for i in range(n):
+            deviation = self._window[i] - mean
+            squares += deviation * deviation
+        return sqrt(<double>(squares / (n - 1)))
+
+    @property
+    def latencies(self):
+        """Latencies in the window, oldest first."""
+        start = self._cursor if self._count == self.window_size else 0
+        return [self._window[(start + i) % self.window_size] for i in range(self._count)]
+
+    def get_stats(self):
+        """Get current latency statistics."""
+        cdef Py_ssize_t n = self._count
+        if n == 0:
+            return "No messages received yet"
+
+        current = self._window[(self._cursor - 1 + self.window_size) % self.window_size]
+        avg = <double>(<long double>self._sum / n)
+        std = self._std()
+        min_lat = self._min_val[self._min_head]
+        max_lat = self._max_val[self._max_head]
+
+        return (f"Latency: {current:,}ns (current) | "
+                f"{avg:,.0f}ns (avg) | "
+                f"{std:,.0f}ns (std) | "
+                f"{min_lat:,}ns (min) | "
+                f"{max_lat:,}ns (max) | "
+                f"Messages: {self.message_count}")
+
+
+def run_loop(int fd, CLatencyStats stats, handle, long long print_every=1, report=None,
+             int64_t report_interval_ns=1000000000):
+    """Receive binary messages on fd and record their latency until an exception is raised.
+
+    The receive, timestamp, send_time decode and stats update run in C. Every
+    print_every-th message and any datagram of the wrong size is passed to
+    handle(data, addr, recv_ts, None) instead; with handle None those are only
+    counted or dropped. report(), if given, is called every report_interval_ns.
+    """
+    cdef unsigned char buf[RECV_BUFFER_SIZE]
+    cdef unsigned char name[16]
+    cdef socklen_t namelen
+    cdef ssize_t nbytes
+    cdef int err
+    cdef int64_t recv_ts
+    cdef int64_t next_report = _now_ns() + report_interval_ns
+
+    while True:
+        namelen = sizeof(name)
+        with nogil:
+            nbytes = recvfrom(fd, buf, sizeof(buf), 0, <sockaddr *>name, &namelen)
+            err = errno
+        if nbytes < 0:
+            if err == EINTR:
+                # Let Python run its signal handlers (e.g. raise KeyboardInterrupt)
+                PyErr_CheckSignals()
+                continue
+            raise OSError(err, os.strerror(err))
+        recv_ts = _now_ns()
+
+        if handle is not None and (nbytes != MSG_SIZE or stats.message_count % print_every == 0):
+            addr = (f"{name[4]}.{name[5]}.{name[6]}.{name[7]}", (name[2] << 8) | name[3])
+            handle((<char *>buf)[:nbytes], addr, recv_ts, None)
+        elif nbytes == MSG_SIZE:
+            stats.add_latency(recv_ts - <int64_t>_load_be64(buf))
+
+        if report is not None and recv_ts >= next_report:
+            report()
+            next_report = recv_ts + report_interval_ns
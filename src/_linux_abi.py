@@ -0,0 +1,172 @@
+"""
+ctypes definitions of the Linux socket and io_uring ABI shared by the producer and listener.
+"""
+import ctypes
+import errno
+import mmap
+import os
+import sys
+
+
+class IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class SockAddrIn(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort),
+                ('sin_port', ctypes.c_uint16),
+                ('sin_addr', ctypes.c_uint8 * 4),
+                ('sin_zero', ctypes.c_uint8 * 8)]
+
+
+class MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(IOVec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', MsgHdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+# libc with errno capture, None off Linux
+libc = None
+if sys.platform.startswith('linux'):
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        libc = None
+
+# io_uring ABI (see include/uapi/linux/io_uring.h)
+NR_IO_URING_SETUP = 425
+NR_IO_URING_ENTER = 426
+NR_IO_URING_REGISTER = 427
+IORING_SETUP_COOP_TASKRUN = 1 << 8
+IORING_SETUP_SINGLE_ISSUER = 1 << 12
+IORING_SETUP_DEFER_TASKRUN = 1 << 13
+IORING_FEAT_SINGLE_MMAP = 1 << 0
+IORING_ENTER_GETEVENTS = 1 << 0
+IORING_REGISTER_PBUF_RING = 22
+IORING_OP_SENDMSG = 9
+IORING_OP_RECVMSG = 10
+IORING_RECV_MULTISHOT = 1 << 1
+IOSQE_BUFFER_SELECT = 1 << 5
+IORING_CQE_F_BUFFER = 1 << 0
+IORING_CQE_F_MORE = 1 << 1
+IORING_CQE_BUFFER_SHIFT = 16
+IORING_OFF_SQES = 0x10000000
+
+
+class IoSqringOffsets(ctypes.Structure):
+    _fields_ = [('head', ctypes.c_uint32), ('tail', ctypes.c_uint32),
+                ('ring_mask', ctypes.c_uint32), ('ring_entries', ctypes.c_uint32),
+                ('flags', ctypes.c_uint32), ('dropped', ctypes.c_uint32),
+                ('array', ctypes.c_uint32), ('resv1', ctypes.c_uint32),
+                ('user_addr', ctypes.c_uint64)]
+
+
+class IoCqringOffsets(ctypes.Structure):
+    _fields_ = [('head', ctypes.c_uint32), ('tail', ctypes.c_uint32),
+                ('ring_mask', ctypes.c_uint32), ('ring_entries', ctypes.c_uint32),
+                ('overflow', ctypes.c_uint32), ('cqes', ctypes.c_uint32),
+                ('flags', ctypes.c_uint32), ('resv1', ctypes.c_uint32),
+                ('user_addr', ctypes.c_uint64)]
+
+
+class IoUringParams(ctypes.Structure):
+    _fields_ = [('sq_entries', ctypes.c_uint32), ('cq_entries', ctypes.c_uint32),
+                ('flags', ctypes.c_uint32), ('sq_thread_cpu', ctypes.c_uint32),
+                ('sq_thread_idle', ctypes.c_uint32), ('features', ctypes.c_uint32),
+                ('wq_fd', ctypes.c_uint32), ('resv', ctypes.c_uint32 * 3),
+                ('sq_off', IoSqringOffsets), ('cq_off', IoCqringOffsets)]
+
+
+class IoUringSqe(ctypes.Structure):
+    _fields_ = [('opcode', ctypes.c_uint8), ('flags', ctypes.c_uint8),
+                ('ioprio', ctypes.c_uint16), ('fd', ctypes.c_int32),
+                ('off', ctypes.c_uint64), ('addr', ctypes.c_uint64),
+                ('len', ctypes.c_uint32), ('msg_flags', ctypes.c_uint32),
+                ('user_data', ctypes.c_uint64), ('buf_group', ctypes.c_uint16),
+                ('personality', ctypes.c_uint16), ('file_index', ctypes.c_int32),
+                ('addr3', ctypes.c_uint64), ('pad', ctypes.c_uint64)]
+
+
+class IoUringCqe(ctypes.Structure):
+    _fields_ = [('user_data', ctypes.c_uint64), ('res', ctypes.c_int32),
+                ('flags', ctypes.c_uint32)]
+
+
+class IoUringBuf(ctypes.Structure):
+    _fields_ = [('addr', ctypes.c_uint64), ('len', ctypes.c_uint32),
+                ('bid', ctypes.c_uint16), ('resv', ctypes.c_uint16)]
+
+
+class IoUringBufReg(ctypes.Structure):
+    _fields_ = [('ring_addr', ctypes.c_uint64), ('ring_entries', ctypes.c_uint32),
+                ('bgid', ctypes.c_uint16), ('flags', ctypes.c_uint16),
+                ('resv', ctypes.c_uint64 * 3)]
+
+
+def mmap_address(mm):
+    """Return the base address of an mmap object."""
+    buf = ctypes.c_char.from_buffer(mm)
+    address = ctypes.addressof(buf)
+    del buf
+    return address
+
+
+class IoUring:
+    """An io_uring instance with its SQ/CQ rings and SQE array mapped.
+    
+    The ring is created with SINGLE_ISSUER, DEFER_TASKRUN and COOP_TASKRUN,
+    so it must only be used from the thread that created it. The ring
+    fields are exposed as ctypes views for the caller to fill and reap.
+    """
+    def __init__(self, entries: int):
+        if libc is None:
+            raise OSError(errno.ENOSYS, "io_uring is only available on Linux")
+        params = IoUringParams()
+        params.flags = (IORING_SETUP_SINGLE_ISSUER | IORING_SETUP_DEFER_TASKRUN |
+                        IORING_SETUP_COOP_TASKRUN)
+        self.fd = libc.syscall(NR_IO_URING_SETUP, ctypes.c_uint(entries), ctypes.byref(params))
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"io_uring_setup failed: {os.strerror(err)}")
+        if not params.features & IORING_FEAT_SINGLE_MMAP:
+            os.close(self.fd)
+            raise OSError(errno.ENOSYS, "io_uring_setup failed: kernel too old")
+        self.sq_entries = params.sq_entries
+        self.cq_entries = params.cq_entries
+        
+        # Map the shared SQ/CQ rings and the SQE array
+        sq_off, cq_off = params.sq_off, params.cq_off
+        ring_size = max(sq_off.array + params.sq_entries * 4,
+                        cq_off.cqes + params.cq_entries * ctypes.sizeof(IoUringCqe))
+        self._ring_mm = mmap.mmap(self.fd, ring_size, mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE)
+        self._sqes_mm = mmap.mmap(self.fd, params.sq_entries * ctypes.sizeof(IoUringSqe),
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE,
+                                  offset=IORING_OFF_SQES)
+        ring_base = mmap_address(self._ring_mm)
+        self.sq_tail = ctypes.c_uint32.from_address(ring_base + sq_off.tail)
+        self.sq_mask = ctypes.c_uint32.from_address(ring_base + sq_off.ring_mask).value
+        self.sq_array = (ctypes.c_uint32 * params.sq_entries).from_address(ring_base + sq_off.array)
+        self.sqes = (IoUringSqe * params.sq_entries).from_address(mmap_address(self._sqes_mm))
+        self.cq_head = ctypes.c_uint32.from_address(ring_base + cq_off.head)
+        self.cq_tail = ctypes.c_uint32.from_address(ring_base + cq_off.tail)
+        self.cq_mask = ctypes.c_uint32.from_address(ring_base + cq_off.ring_mask).value
+        self.cqes = (IoUringCqe * params.cq_entries).from_address(ring_base + cq_off.cqes)
+    
+    def close(self) -> None:
+        """Drop the ring views, release the mappings and close the ring."""
+        self.sqes = self.cqes = None
+        self.sq_tail = self.sq_array = self.cq_head = self.cq_tail = None
+        for mm in (self._ring_mm, self._sqes_mm):
+            mm.close()
+        os.close(self.fd)
@@ -0,0 +1,160 @@
+# cython: language_level=3
+"""
+Compiled encoder and send loop for the producer.
+
+Build in place with: cythonize -3 -i src/_packer.pyx
+"""
+from libc.stdint cimport int16_t, int64_t, uint8_t, uint16_t, uint32_t, uint64_t
+from libc.string cimport memcpy
+from libc.math cimport rint
+from libc.errno cimport errno, EINTR
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_GET_SIZE, PyBytes_FromStringAndSize
+from cpython.bytearray cimport PyByteArray_AS_STRING, PyByteArray_GET_SIZE
+from cpython.exc cimport PyErr_CheckSignals
+from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC, CLOCK_REALTIME
+import os
+
+cdef extern from "<endian.h>":
+    uint64_t htobe64(uint64_t x) nogil
+    uint32_t htobe32(uint32_t x) nogil
+    uint16_t htobe16(uint16_t x) nogil
+
+cdef extern from "<sys/socket.h>":
+    ssize_t send(int fd, const void *buf, size_t n, int flags) nogil
+
+cdef extern from "<time.h>":
+    enum: TIMER_ABSTIME
+    int clock_nanosleep(int clock_id, int flags, const timespec *request, timespec *remain) nogil
+
+# Binary message layout '!QIhhB', temperature and humidity in tenths
+DEF MSG_SIZE = 17
+
+
+cdef inline void _pack(char *buf, uint64_t send_time, uint32_t counter, int16_t temperature,
+                       int16_t humidity, uint8_t status) noexcept nogil:
+    cdef uint64_t be64 = htobe64(send_time)
+    cdef uint32_t be32 = htobe32(counter)
+    cdef uint16_t be16
+    memcpy(buf, &be64, 8)
+    memcpy(buf + 8, &be32, 4)
+    be16 = htobe16(<uint16_t>temperature)
+    memcpy(buf + 12, &be16, 2)
+    be16 = htobe16(<uint16_t>humidity)
+    memcpy(buf + 14, &be16, 2)
+    buf[16] = <char>status
+
+
+cdef inline int64_t _clock_ns(int clock_id) noexcept nogil:
+    cdef timespec ts
+    clock_gettime(clock_id, &ts)
+    return <int64_t>ts.tv_sec * 1000000000 + ts.tv_nsec
+
+
+cdef inline int16_t _tenths(double value) except? -1:
+    """Scale to tenths, rounding half to even like Python's round()."""
+    cdef double scaled = rint(value * 10)
+    if not -32768 <= scaled <= 32767:
+        raise OverflowError(f"{value} is out of range for the int16 tenths field")
+    return <int16_t>scaled
+
+
+cpdef bytes pack_msg(uint64_t send_time, uint32_t counter, double temperature, double humidity, uint8_t status):
+    """Pack the message fields like struct.Struct('!QIhhB').pack(), scaling temperature and humidity to tenths."""
+    cdef char buf[MSG_SIZE]
+    _pack(buf, send_time, counter, _tenths(temperature), _tenths(humidity), status)
+    return PyBytes_FromStringAndSize(buf, MSG_SIZE)
+
+
+cpdef Py_ssize_t pack_msg_into(bytearray buffer, Py_ssize_t offset, uint64_t send_time, uint32_t counter,
+                               double temperature, double humidity, uint8_t status) except -1:
+    """Like pack_msg(), but write the message into the bytearray at offset; returns its length."""
+    cdef Py_ssize_t size = PyByteArray_GET_SIZE(buffer)
+    if offset < 0 or offset + MSG_SIZE > size:
+        raise ValueError(f"pack_msg_into needs {MSG_SIZE} bytes at offset {offset} in a buffer of {size}")
+    _pack(PyByteArray_AS_STRING(buffer) + offset, send_time, counter, _tenths(temperature), _tenths(humidity), status)
+    return MSG_SIZE
+
+
+cdef int _send_checked(int fd, const char *data, size_t length) except -1:
+    """send(2) on the connected socket, retrying after signals that don't raise."""
+    cdef ssize_t nbytes
+    cdef int err
+    while True:
+        with nogil:
+            nbytes = send(fd, data, length, 0)
+            err = errno
+        if nbytes >= 0:
+            return 0
+        if err != EINTR:
+            raise OSError(err, os.strerror(err))
+        # Let Python run its signal handlers (e.g. raise KeyboardInterrupt)
+        PyErr_CheckSignals()
+
+
+cdef int _sleep_until(int64_t deadline) except -1:
+    """Sleep until the CLOCK_MONOTONIC deadline, in nanoseconds."""
+    cdef timespec ts
+    cdef int err
+    ts.tv_sec = deadline // 1000000000
+    ts.tv_nsec = deadline % 1000000000
+    while True:
+        with nogil:
+            err = clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &ts, NULL)
+        if err != EINTR:
+            return 0
+        PyErr_CheckSignals()
+
+
+def run_loop(int fd, message, make_message, encode, bint include_timestamp=False, double interval=0,
+             long long sample_every=1, sample=None, report=None, double report_interval=1.0):
+    """Send messages on the connected socket fd until an exception is raised.
+
+    Counting, pacing against an interval deadline, the send and the rate
+    accounting run in C. With encode None the binary message is packed in C
+    straight from the counter, like encode_binary_message(create_message(n));
+    otherwise make_message(n, include_timestamp, message) refills message and
+    encode(message) must return the datagram. Every sample_every-th message
+    is handed to sample(n), which sends it and returns its length.
+    report(messages, nbytes, elapsed), if given, is called every report_interval.
+    """
+    cdef char buf[MSG_SIZE]
+    cdef long long message_count = 0
+    cdef long long sent_messages = 0
+    cdef long long sent_bytes = 0
+    cdef int64_t interval_ns = <int64_t>(interval * 1e9)
+    cdef int64_t report_interval_ns = <int64_t>(report_interval * 1e9)
+    cdef int64_t now, report_start, deadline
+    cdef uint32_t counter
+    cdef bytes data
+
+    report_start = deadline = _clock_ns(CLOCK_MONOTONIC)
+    while True:
+        if sample is not None and message_count % sample_every == 0:
+            sent_bytes += sample(message_count)
+        elif encode is None:
+            counter = <uint32_t>message_count
+            _pack(buf, <uint64_t>_clock_ns(CLOCK_REALTIME), counter,
+                  255 + counter % 10 * 10, 600 + counter % 20 * 10, 1)
+            _send_checked(fd, buf, MSG_SIZE)
+            sent_bytes += MSG_SIZE
+        else:
+            make_message(message_count, include_timestamp, message)
+            data = encode(message)
+            _send_checked(fd, PyBytes_AS_STRING(data), PyBytes_GET_SIZE(data))
+            sent_bytes += PyBytes_GET_SIZE(data)
+        message_count += 1
+        sent_messages += 1
+
+        now = _clock_ns(CLOCK_MONOTONIC)
+        if now - report_start >= report_interval_ns:
+            if report is not None:
+                report(sent_messages, sent_bytes, (now - report_start) / 1e9)
+            sent_messages = sent_bytes = 0
+            report_start = now
+        if interval_ns > 0:
+            # Absolute deadlines keep the cadence from drifting; restart it when running behind
+            deadline += interval_ns
+            if deadline > now:
+                _sleep_until(deadline)
+            else:
+                deadline = now
@@ -5,36 +5,186 @@ Multicast listener that prints received messages and calculates latency.
 import socket
 import struct
 import argparse
+import array
+import ctypes
+import functools
+import errno
+import math
+import mmap
+import os
+import queue
+import selectors
 import sys
+import threading
 import time
 import json
-from statistics import mean, stdev
 from collections import deque
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Shared ctypes socket/io_uring ABI; plain import when run as a script from src/
+try:
+    from . import _linux_abi as abi
+except ImportError:
+    import _linux_abi as abi
+
+# Optional Cython build of the binary receive loop (see _fast_listener.pyx)
+try:
+    from . import _fast_listener
+except ImportError:
+    try:
+        import _fast_listener
+    except ImportError:
+        _fast_listener = None
+
+# Optional, for listing interfaces when --interface is wrong
+try:
+    import netifaces
+except ImportError:
+    netifaces = None
+
+# orjson parses bytes/memoryviews directly, skipping the separate UTF-8 decode
+if orjson is not None:
+    _json_loads = orjson.loads
+    
+    def _json_pretty(message) -> str:
+        return orjson.dumps(message, option=orjson.OPT_INDENT_2).decode('utf-8')
+else:
+    def _json_loads(data):
+        return json.loads(str(data, 'utf-8'))
+    
+    def _json_pretty(message) -> str:
+        return json.dumps(message, indent=2)
+
+_msgpack_loads = functools.partial(msgpack.unpackb, raw=False) if msgpack is not None else None
+
+# Binary message layout shared with the producer, compiled once; temperature
+# and humidity travel as int16 tenths
+_MSG_STRUCT = struct.Struct('!QIhhB')
+_MSG_SIZE = _MSG_STRUCT.size
+
+# Receive batching: up to RECV_BATCH_SIZE datagrams per recvmmsg(2) call
+RECV_BATCH_SIZE = 64
+RECV_BUFFER_SIZE = 2048
+RECV_QUEUE_DEPTH = 1024
+
+# Socket tuning defaults; SO_BUSY_POLL is missing from the socket module
+DEFAULT_RCVBUF = 16 * 1024 * 1024
+SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL', 46)
+SO_INCOMING_CPU = getattr(socket, 'SO_INCOMING_CPU', 49)
+
+# Line printed after each message
+_SEPARATOR = "-" * 50 + "\n"
+
+# How often --stats-only prints the latency summary
+STATS_REPORT_INTERVAL_NS = 1_000_000_000
+MSG_WAITFORONE = 0x10000
+
+# Monotonic clock for receive/decode intervals; latency still uses the wall clock
+_now = time.perf_counter_ns
+
+
+_recvmmsg = None
+if abi.libc is not None:
+    try:
+        _recvmmsg = abi.libc.recvmmsg
+        _recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(abi.MMsgHdr), ctypes.c_uint,
+                              ctypes.c_int, ctypes.c_void_p]
+        _recvmmsg.restype = ctypes.c_int
+    except AttributeError:
+        _recvmmsg = None
+
+IO_URING_BUFFERS = 256
+
+# Header the kernel writes at the start of each multishot recvmsg buffer,
+# followed by the source sockaddr_in and then the payload
+_RECVMSG_OUT = struct.Struct('=IIII')
+_SOCKADDR_IN = struct.Struct('!2xH4s8x')
+
 
 class LatencyStats:
-    """Class to track latency statistics."""
+    """Class to track latency statistics over a sliding window.
+    
+    The window is a fixed array.array ring buffer of int64 values. Running
+    sums and monotonic min/max deques are updated incrementally, so both
+    add_latency() and get_stats() are O(1) regardless of window size.
+    """
     def __init__(self, window_size=100):
         self.window_size = window_size
-        self.latencies = deque(maxlen=window_size)
+        self._buf = array.array('q', [0] * window_size)
+        self._idx = 0
+        self._n = 0
         self.start_time = time.time_ns()
         self.message_count = 0
+        # Exact integer sums of the window, so the variance has no rounding error
+        self._sum = 0
+        self._sumsq = 0
+        # (message index, latency) pairs with increasing / decreasing latencies
+        self._min_deque = deque()
+        self._max_deque = deque()
     
     def add_latency(self, latency_ns):
-        """Add a new latency measurement."""
-        self.latencies.append(latency_ns)
+        """Add a new latency measurement.
+        
+        Raises OverflowError, leaving the stats untouched, if latency_ns
+        does not fit in an int64.
+        """
+        idx = self._idx
+        evicted = self._buf[idx]
+        # Store first so an out-of-range latency is rejected before any state changes
+        self._buf[idx] = latency_ns
+        if self._n == self.window_size:
+            self._sum -= evicted
+            self._sumsq -= evicted * evicted
+        else:
+            self._n += 1
+        self._idx = (idx + 1) % self.window_size
+        self._sum += latency_ns
+        self._sumsq += latency_ns * latency_ns
+        
+        index = self.message_count
+        while self._min_deque and self._min_deque[-1][1] >= latency_ns:
+            self._min_deque.pop()
+        self._min_deque.append((index, latency_ns))
+        while self._max_deque and self._max_deque[-1][1] <= latency_ns:
+            self._max_deque.pop()
+        self._max_deque.append((index, latency_ns))
+        
+        # Drop entries that have slid out of the window
+        oldest = index - self.window_size
+        if self._min_deque[0][0] <= oldest:
+            self._min_deque.popleft()
+        if self._max_deque[0][0] <= oldest:
+            self._max_deque.popleft()
         self.message_count += 1
     
+    @property
+    def latencies(self):
+        """Latencies in the window, oldest first."""
+        if self._n < self.window_size:
+            return list(self._buf[:self._n])
+        return list(self._buf[self._idx:]) + list(self._buf[:self._idx])
+    
     def get_stats(self):
         """Get current latency statistics."""
-        if not self.latencies:
+        n = self._n
+        if not n:
             return "No messages received yet"
         
-        current = self.latencies[-1]
-        avg = mean(self.latencies)
-        std = stdev(self.latencies) if len(self.latencies) > 1 else 0
-        min_lat = min(self.latencies)
-        max_lat = max(self.latencies)
+        current = self._buf[self._idx - 1]
+        avg = self._sum / n
+        # Sample variance: (n*sum(x^2) - sum(x)^2) / (n*(n-1))
+        std = math.sqrt((n * self._sumsq - self._sum * self._sum) / (n * (n - 1))) if n > 1 else 0
+        min_lat = self._min_deque[0][1]
+        max_lat = self._max_deque[0][1]
         
         return (f"Latency: {current:,}ns (current) | "
                 f"{avg:,.0f}ns (avg) | "
@@ -44,17 +194,239 @@ class LatencyStats:
                 f"Messages: {self.message_count}")
 
 
+class BatchReceiver:
+    """Receive multiple datagrams per syscall using recvmmsg(2).
+
+    The receive buffers are allocated once and reused for every batch, so the
+    memoryviews returned by recv() are only valid until the next call.
+    On platforms without recvmmsg this falls back to one recvfrom_into() per
+    call, still into the preallocated buffer.
+    """
+    def __init__(self, sock, batch_size=RECV_BATCH_SIZE, buffer_size=RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size if _recvmmsg is not None else 1
+        self._buffers = [bytearray(buffer_size) for _ in range(self.batch_size)]
+        self._views = [memoryview(buf) for buf in self._buffers]
+        if _recvmmsg is None:
+            return
+        
+        # iovec/sockaddr/mmsghdr arrays pointing into the buffer pool
+        self._iovecs = (abi.IOVec * batch_size)()
+        self._names = (abi.SockAddrIn * batch_size)()
+        self._msgs = (abi.MMsgHdr * batch_size)()
+        for i, buf in enumerate(self._buffers):
+            self._iovecs[i].iov_base = ctypes.addressof((ctypes.c_char * buffer_size).from_buffer(buf))
+            self._iovecs[i].iov_len = buffer_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._names[i])
+            hdr.msg_namelen = ctypes.sizeof(abi.SockAddrIn)
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+    
+    def recv(self):
+        """Block until data arrives and return a list of (data, addr) tuples."""
+        if _recvmmsg is None:
+            view = self._views[0]
+            nbytes, addr = self.sock.recvfrom_into(view)
+            return [(view[:nbytes], addr)]
+        
+        count = _recvmmsg(self.sock.fileno(), self._msgs, self.batch_size, MSG_WAITFORONE, None)
+        if count < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                # Interrupted by a signal; let the interpreter raise it
+                return []
+            raise OSError(err, os.strerror(err))
+        
+        msgs, views, names = self._msgs, self._views, self._names
+        return [(views[i][:msgs[i].msg_len],
+                 (socket.inet_ntoa(bytes(names[i].sin_addr)), socket.ntohs(names[i].sin_port)))
+                for i in range(count)]
+
+
+class SelectorReceiver:
+    """Receive datagrams by draining a non-blocking socket after each readiness event.
+
+    The socket is registered with selectors.DefaultSelector (epoll on Linux).
+    Each wakeup reads queued datagrams with recvfrom_into() until the socket
+    reports EAGAIN or the buffer pool is full, so one wait covers a whole
+    burst. Readiness is level-triggered, so anything left over when the pool
+    fills is picked up on the next call. As with BatchReceiver, the returned
+    memoryviews are only valid until the next call.
+    """
+    def __init__(self, sock, batch_size=RECV_BATCH_SIZE, buffer_size=RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self._views = [memoryview(bytearray(buffer_size)) for _ in range(batch_size)]
+        sock.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(sock, selectors.EVENT_READ)
+    
+    def recv(self):
+        """Wait for readiness and return a list of (data, addr) tuples."""
+        self._selector.select()
+        recvfrom_into = self.sock.recvfrom_into
+        batch = []
+        for view in self._views:
+            try:
+                nbytes, addr = recvfrom_into(view)
+            except BlockingIOError:
+                break
+            batch.append((view[:nbytes], addr))
+        return batch
+    
+    def close(self):
+        """Unregister the socket and close the selector."""
+        self._selector.close()
+
+
+class IoUringReceiver:
+    """Receive datagrams with an io_uring multishot recvmsg (Linux 6.1+).
+
+    A single submission keeps producing completions, and the kernel picks the
+    destination buffer from a registered ring of provided buffers, so there
+    is no per-packet submission or copy. Buffers handed out by recv() are
+    given back to the kernel on the next call, so the returned memoryviews
+    are only valid until then. The ring is created with SINGLE_ISSUER, so
+    recv() must always be called from the thread that created the receiver.
+    """
+    def __init__(self, sock, buffers=IO_URING_BUFFERS, buffer_size=RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer_size = buffer_size
+        
+        self._ring = abi.IoUring(buffers)
+        self._ring_fd = self._ring.fd
+        self._sq_tail, self._sq_mask = self._ring.sq_tail, self._ring.sq_mask
+        self._sq_array, self._sqes = self._ring.sq_array, self._ring.sqes
+        self._cq_head, self._cq_tail = self._ring.cq_head, self._ring.cq_tail
+        self._cq_mask, self._cqes = self._ring.cq_mask, self._ring.cqes
+        
+        # Provided buffer ring (page aligned) plus the buffer pool it points into
+        self._buf_ring_mm = mmap.mmap(-1, buffers * ctypes.sizeof(abi.IoUringBuf))
+        self._buf_ring = (abi.IoUringBuf * buffers).from_address(abi.mmap_address(self._buf_ring_mm))
+        self._buf_tail = ctypes.c_uint16.from_address(abi.mmap_address(self._buf_ring_mm) + 14)
+        self._buf_mask = buffers - 1
+        self._pool = bytearray(buffers * buffer_size)
+        self._pool_base = ctypes.addressof((ctypes.c_char * len(self._pool)).from_buffer(self._pool))
+        self._views = [memoryview(self._pool)[i * buffer_size:(i + 1) * buffer_size]
+                       for i in range(buffers)]
+        for bid in range(buffers):
+            self._add_buffer(bid, bid)
+        self._buf_tail.value = buffers
+        
+        reg = abi.IoUringBufReg()
+        reg.ring_addr = abi.mmap_address(self._buf_ring_mm)
+        reg.ring_entries = buffers
+        reg.bgid = 0
+        if abi.libc.syscall(abi.NR_IO_URING_REGISTER, ctypes.c_uint(self._ring_fd),
+                             ctypes.c_uint(abi.IORING_REGISTER_PBUF_RING), ctypes.byref(reg), ctypes.c_uint(1)) < 0:
+            err = ctypes.get_errno()
+            self.close()
+            raise OSError(err, f"io_uring buffer ring registration failed: {os.strerror(err)}")
+        
+        # Template msghdr: only the name/control lengths are used in multishot mode
+        self._msghdr = abi.MsgHdr()
+        self._msghdr.msg_namelen = ctypes.sizeof(abi.SockAddrIn)
+        self._payload_offset = _RECVMSG_OUT.size + ctypes.sizeof(abi.SockAddrIn)
+        self._to_submit = 0
+        self._in_use = []
+        self._arm()
+    
+    def _add_buffer(self, bid, offset):
+        """Place buffer bid in the provided buffer ring, offset entries past the tail."""
+        entry = self._buf_ring[(self._buf_tail.value + offset) & self._buf_mask]
+        entry.addr = self._pool_base + bid * self.buffer_size
+        entry.len = self.buffer_size
+        entry.bid = bid
+    
+    def _arm(self):
+        """Queue the multishot recvmsg submission."""
+        tail = self._sq_tail.value
+        index = tail & self._sq_mask
+        ctypes.memset(ctypes.byref(self._sqes[index]), 0, ctypes.sizeof(abi.IoUringSqe))
+        sqe = self._sqes[index]
+        sqe.opcode = abi.IORING_OP_RECVMSG
+        sqe.fd = self.sock.fileno()
+        sqe.addr = ctypes.addressof(self._msghdr)
+        sqe.len = 1
+        sqe.ioprio = abi.IORING_RECV_MULTISHOT
+        sqe.flags = abi.IOSQE_BUFFER_SELECT
+        sqe.buf_group = 0
+        self._sq_array[index] = index
+        self._sq_tail.value = tail + 1
+        self._to_submit += 1
+    
+    def recv(self):
+        """Block until data arrives and return a list of (data, addr) tuples."""
+        # Hand the buffers from the previous batch back to the kernel
+        if self._in_use:
+            for offset, bid in enumerate(self._in_use):
+                self._add_buffer(bid, offset)
+            self._buf_tail.value = (self._buf_tail.value + len(self._in_use)) & 0xFFFF
+            self._in_use = []
+        
+        ret = abi.libc.syscall(abi.NR_IO_URING_ENTER, ctypes.c_uint(self._ring_fd), ctypes.c_uint(self._to_submit),
+                                ctypes.c_uint(1), ctypes.c_uint(abi.IORING_ENTER_GETEVENTS), None, ctypes.c_size_t(0))
+        if ret < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                # Interrupted by a signal; let the interpreter raise it
+                return []
+            raise OSError(err, f"io_uring_enter failed: {os.strerror(err)}")
+        self._to_submit -= ret
+        
+        batch = []
+        head, tail = self._cq_head.value, self._cq_tail.value
+        while head != tail:
+            cqe = self._cqes[head & self._cq_mask]
+            res, flags = cqe.res, cqe.flags
+            head += 1
+            if flags & abi.IORING_CQE_F_BUFFER:
+                bid = flags >> abi.IORING_CQE_BUFFER_SHIFT
+                self._in_use.append(bid)
+                if res >= 0:
+                    view = self._views[bid]
+                    payload_len = _RECVMSG_OUT.unpack_from(view)[2]
+                    port, addr = _SOCKADDR_IN.unpack_from(view, _RECVMSG_OUT.size)
+                    end = self._payload_offset + min(payload_len, self.buffer_size - self._payload_offset)
+                    batch.append((view[self._payload_offset:end], (socket.inet_ntoa(addr), port)))
+            if not flags & abi.IORING_CQE_F_MORE:
+                # Multishot terminated (e.g. ENOBUFS when all buffers are in use); re-arm
+                if res < 0 and res != -errno.ENOBUFS:
+                    self._cq_head.value = head
+                    raise OSError(-res, f"io_uring recvmsg failed: {os.strerror(-res)}")
+                self._arm()
+        self._cq_head.value = head
+        return batch
+    
+    def close(self):
+        """Tear down the ring and release its mappings."""
+        self._sqes = self._cqes = self._buf_ring = None
+        self._sq_tail = self._sq_array = self._cq_head = self._cq_tail = self._buf_tail = None
+        self._buf_ring_mm.close()
+        self._ring.close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_available_interfaces():
+    """Return (interface, IPv4 address) pairs, enumerated once; None without netifaces."""
+    if netifaces is None:
+        return None
+    return tuple((iface, addr['addr'])
+                 for iface in netifaces.interfaces()
+                 for addr in netifaces.ifaddresses(iface).get(netifaces.AF_INET, ()))
+
+
 def list_available_interfaces():
     """List all available network interfaces and their IP addresses."""
     print("\nAvailable network interfaces:")
-    try:
-        import netifaces
-        for iface in netifaces.interfaces():
-            addrs = netifaces.ifaddresses(iface)
-            if netifaces.AF_INET in addrs:
-                for addr in addrs[netifaces.AF_INET]:
-                    print(f"  {iface}: {addr['addr']}")
-    except ImportError:
+    interfaces = get_available_interfaces()
+    if interfaces is not None:
+        for iface, ip in interfaces:
+            print(f"  {iface}: {ip}")
+    else:
         print("  Install netifaces package for detailed interface information:")
         print("  pip install netifaces")
         # Fallback to basic interface listing
@@ -68,7 +440,8 @@ def list_available_interfaces():
             print("  Could not list interfaces. Please install netifaces package.")
 
 
-def create_multicast_socket(group: str, port: int, interface: str = None) -> socket.socket:
+def create_multicast_socket(group: str, port: int, interface: str = None, rcvbuf: int = DEFAULT_RCVBUF,
+                            busy_poll: int = None, incoming_cpu: int = None) -> socket.socket:
     """Create and configure a socket for multicast listening."""
     # Create UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
@@ -76,6 +449,33 @@ def create_multicast_socket(group: str, port: int, interface: str = None) -> soc
     # Allow multiple sockets to use the same port
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     
+    # Large receive buffer so bursts queue in the kernel instead of being dropped
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        # Linux reports double the usable size, capped by net.core.rmem_max
+        actual = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if sys.platform.startswith('linux'):
+            actual //= 2
+        if actual < rcvbuf:
+            print(f"Receive buffer limited to {actual:,} bytes (requested {rcvbuf:,}); "
+                  f"raise net.core.rmem_max to allow more")
+    
+    # Busy-poll the NIC queue for up to busy_poll microseconds on blocking receives
+    if busy_poll:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, busy_poll)
+        except OSError as e:
+            print(f"Could not enable busy polling: {e} "
+                  f"(needs Linux and CAP_NET_ADMIN, or net.core.busy_read set)")
+    
+    # Record the CPU this socket is consumed on, so the kernel can match it
+    # with the CPU that processes the NIC queue
+    if incoming_cpu is not None:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_INCOMING_CPU, incoming_cpu)
+        except OSError as e:
+            print(f"Could not set SO_INCOMING_CPU: {e} (needs Linux 3.19+)")
+    
     # Bind to the server address
     sock.bind(('', port))
     
@@ -117,96 +517,309 @@ def decode_binary_message(data: bytes) -> dict:
     # Format: 
     # - 8 bytes: timestamp (Q - unsigned long long)
     # - 4 bytes: counter (I - unsigned int)
-    # - 4 bytes: temperature (f - float)
-    # - 4 bytes: humidity (f - float)
+    # - 2 bytes: temperature in tenths (h - signed short)
+    # - 2 bytes: humidity in tenths (h - signed short)
     # - 1 byte: status (B - unsigned char, 1 for active, 0 for inactive)
-    send_time, counter, temperature, humidity, status = struct.unpack('!QIffB', data)
+    send_time, counter, temperature, humidity, status = _MSG_STRUCT.unpack(data)
     return {
         "send_time": send_time,
         "counter": counter,
         "data": {
-            "temperature": temperature,
-            "humidity": humidity,
+            "temperature": temperature / 10,
+            "humidity": humidity / 10,
             "status": "active" if status == 1 else "inactive"
         }
     }
 
 
-def listen_for_multicast(group: str, port: int, format_type: str = 'json', interface: str = None) -> None:
+def decode_binary_fields(data) -> tuple:
+    """Decode a binary message into a (send_time, counter, temperature, humidity, status) tuple.
+    
+    Temperature and humidity are returned as sent, in integer tenths.
+    """
+    # unpack_from reads straight from the buffer; callers check the length first
+    return _MSG_STRUCT.unpack_from(data)
+
+
+def _record_json(data, recv_ts: int, stats: LatencyStats, loads=_json_loads) -> None:
+    """Record the latency of a JSON (or, via loads, MessagePack) datagram without printing the message."""
+    try:
+        message = loads(data)
+        send_time = message.get('send_time', message.get('t'))
+        if isinstance(send_time, float):
+            send_time = int(send_time * 1_000_000_000)
+        if send_time is not None:
+            stats.add_latency(recv_ts - send_time)
+    except (ValueError, AttributeError, OverflowError):
+        # Undecodable, or a send_time whose latency does not fit in an int64
+        return
+
+
+def _record_binary(data, recv_ts: int, stats: LatencyStats) -> None:
+    """Record the latency of a binary datagram without building the message dict."""
+    if len(data) == _MSG_SIZE:
+        try:
+            stats.add_latency(recv_ts - decode_binary_fields(data)[0])
+        except OverflowError:
+            pass
+
+
+def _handle_json(data, addr, recv_ts: int, recv_time: int, stats: LatencyStats, print_every: int = 1,
+                 loads=_json_loads, parse_label: str = "JSON parsing", profile: bool = False) -> None:
+    """Decode a JSON datagram, update latency stats and print every print_every-th message.
+    
+    recv_time is None under --no-timing; only the end-to-end latency is
+    measured and printed then. The parse time is only measured with profile.
+    MessagePack datagrams go through here too, with loads set to the
+    msgpack decoder.
+    """
+    sampled = stats.message_count % print_every == 0
+    timing = sampled and profile and recv_time is not None
+    try:
+        # Measure JSON parsing time (includes UTF-8 decoding)
+        if timing:
+            json_start = _now()
+        message = loads(data)
+        if timing:
+            json_time = _now() - json_start
+    except ValueError as e:
+        _print_decode_error(data, addr, recv_time, e)
+        return
+    
+    # Calculate latency if send_time ('t' in the compact schema) is present
+    send_time = message.get('send_time', message.get('t')) if isinstance(message, dict) else None
+    if send_time is not None:
+        try:
+            send_time_ns = int(send_time * 1_000_000_000) if isinstance(send_time, float) else send_time
+            latency_ns = recv_ts - send_time_ns
+            stats.add_latency(latency_ns)
+        except (ValueError, OverflowError):
+            # NaN/infinite send_time, or a latency that does not fit in an int64
+            if sampled:
+                _print_decode_error(data, addr, recv_time, f"send_time out of range: {send_time!r}")
+            return
+        if not sampled:
+            return
+        
+        if timing:
+            timings = (("Network receive", recv_time),
+                       (parse_label, json_time),
+                       ("Total processing", recv_time + json_time))
+        else:
+            timings = (("Network receive", recv_time),) if recv_time is not None else ()
+        sys.stdout.write(_render(addr, message, timings, latency_ns, stats))
+    elif sampled:
+        sys.stdout.write(_SEPARATOR)
+
+
+def _handle_binary(data, addr, recv_ts: int, recv_time: int, stats: LatencyStats, print_every: int = 1,
+                   profile: bool = False) -> None:
+    """Decode a binary datagram, update latency stats and print every print_every-th message.
+    
+    recv_time is None under --no-timing; only the end-to-end latency is
+    measured and printed then. The decode time is only measured with profile.
+    """
+    # Reject short/long packets up front instead of raising from unpack
+    if len(data) != _MSG_SIZE:
+        _print_decode_error(data, addr, recv_time,
+                            f"expected {_MSG_SIZE} bytes, got {len(data)}")
+        return
+    
+    # Messages that are not printed skip the dict entirely
+    if stats.message_count % print_every:
+        try:
+            stats.add_latency(recv_ts - decode_binary_fields(data)[0])
+        except OverflowError:
+            pass
+        return
+    
+    # Measure binary decoding time
+    timing = profile and recv_time is not None
+    if timing:
+        decode_start = _now()
+    message = decode_binary_message(data)
+    if timing:
+        decode_time = _now() - decode_start
+    
+    # Calculate latency
+    latency_ns = recv_ts - message['send_time']
+    try:
+        stats.add_latency(latency_ns)
+    except OverflowError:
+        # A send_time of 2**63 or more gives a latency outside the int64 window
+        _print_decode_error(data, addr, recv_time, f"send_time out of range: {message['send_time']}")
+        return
+    
+    if timing:
+        timings = (("Network receive", recv_time),
+                   ("Binary decoding", decode_time),
+                   ("Total processing", recv_time + decode_time))
+    else:
+        timings = (("Network receive", recv_time),) if recv_time is not None else ()
+    sys.stdout.write(_render(addr, message, timings, latency_ns, stats))
+
+
+def _render(addr, message: dict, timings, latency_ns: int, stats: LatencyStats) -> str:
+    """Render a received message as one string so it is written with a single call."""
+    timing_lines = ''.join(f"  {label}: {value:,}\n" for label, value in timings)
+    return (f"\nReceived from {addr[0]}:{addr[1]}\n"
+            f"Message: {_json_pretty(message)}\n"
+            f"Timing (ns):\n"
+            f"{timing_lines}"
+            f"  End-to-end latency: {latency_ns:,}\n"
+            f"Stats: {stats.get_stats()}\n"
+            f"{_SEPARATOR}")
+
+
+def _print_decode_error(data, addr, recv_time: int, error) -> None:
+    """Print details of a datagram that could not be decoded."""
+    timing_lines = f"Timing (ns):\n  Network receive: {recv_time:,}\n" if recv_time is not None else ""
+    sys.stdout.write(f"\nReceived from {addr[0]}:{addr[1]}\n"
+                     f"Error decoding message: {error}\n"
+                     f"Raw data: {data.hex(' ')}\n"
+                     f"Length: {len(data)} bytes\n"
+                     f"{timing_lines}"
+                     f"{_SEPARATOR}")
+
+
+class ReceiveQueue:
+    """Hand received datagrams from the receive thread to a consumer thread.
+
+    Datagrams are copied into a fixed pool of preallocated slots and only the
+    slot index travels through the queue, so the receive side does no decoding,
+    printing or allocation. Slots are returned to a free list once consumed;
+    when the consumer falls behind, put() blocks and the kernel socket buffer
+    absorbs the backlog.
+    """
+    def __init__(self, depth=RECV_QUEUE_DEPTH, buffer_size=RECV_BUFFER_SIZE):
+        self._slots = [bytearray(buffer_size) for _ in range(depth)]
+        self._views = [memoryview(slot) for slot in self._slots]
+        self._free = queue.SimpleQueue()
+        self._ready = queue.SimpleQueue()
+        for index in range(depth):
+            self._free.put(index)
+    
+    def put(self, data, addr, recv_ts: int, recv_time: int) -> None:
+        """Copy a datagram into a free slot and queue it for the consumer."""
+        index = self._free.get()
+        nbytes = len(data)
+        self._slots[index][:nbytes] = data
+        self._ready.put((recv_ts, recv_time, nbytes, index, addr))
+    
+    def close(self) -> None:
+        """Tell the consumer to stop once the queued datagrams are drained."""
+        self._ready.put(None)
+    
+    def consume(self, handle) -> None:
+        """Call handle(data, addr, recv_ts, recv_time) for each queued datagram until closed."""
+        while True:
+            item = self._ready.get()
+            if item is None:
+                return
+            recv_ts, recv_time, nbytes, index, addr = item
+            try:
+                handle(self._views[index][:nbytes], addr, recv_ts, recv_time)
+            except Exception as e:
+                print(f"Error processing message: {e}", file=sys.stderr)
+            finally:
+                self._free.put(index)
+
+
+def listen_for_multicast(group: str, port: int, format_type: str = 'json', interface: str = None,
+                         io_uring: bool = False, threaded: bool = False, stats_only: bool = False,
+                         rcvbuf: int = DEFAULT_RCVBUF, busy_poll: int = None, profile: bool = False,
+                         print_every: int = 1, selector: bool = False, compiled: bool = False,
+                         cpu: int = None, timing: bool = True) -> None:
     """Listen for multicast messages and process them according to format."""
+    receiver = None
+    consumer = None
+    stats = None
     try:
-        sock = create_multicast_socket(group, port, interface)
-        stats = LatencyStats()
+        # Pin to the CPU handling the NIC interrupts to keep the receive path cache-local
+        if cpu is not None:
+            try:
+                os.sched_setaffinity(0, {cpu})
+            except (AttributeError, OSError) as e:
+                print(f"Could not pin to CPU {cpu}: {e}")
+        sock = create_multicast_socket(group, port, interface, rcvbuf, busy_poll, cpu)
+        stats = _fast_listener.CLatencyStats() if compiled else LatencyStats()
         
         print(f"Listening for multicast messages on {group}:{port}")
         print(f"Format: {format_type}")
         if interface:
             print(f"Interface: {interface}")
+        if cpu is not None:
+            print(f"CPU: {cpu}")
+        backend = ('io_uring' if io_uring else 'selector' if selector else
+                   'compiled' if compiled else 'recvmmsg')
+        print(f"Receive backend: {backend}")
+        if not stats_only:
+            print(f"Printing every {print_every} message(s)")
         print("Press Ctrl+C to stop")
         print("-" * 50)
         
-        while True:
-            # Measure network receive time
-            recv_start = time.time_ns()
-            data, addr = sock.recvfrom(1024)
-            recv_time = time.time_ns() - recv_start
+        # Select the per-format handler once instead of comparing format_type per packet
+        if stats_only:
+            record = {'json': _record_json,
+                      'binary': _record_binary,
+                      'msgpack': functools.partial(_record_json, loads=_msgpack_loads)}[format_type]
+            next_report = time.time_ns() + STATS_REPORT_INTERVAL_NS
             
-            try:
-                if format_type == 'json':
-                    # Measure decoding time
-                    decode_start = time.time_ns()
-                    decoded_data = data.decode('utf-8')
-                    decode_time = time.time_ns() - decode_start
-                    
-                    # Measure JSON parsing time
-                    json_start = time.time_ns()
-                    message = json.loads(decoded_data)
-                    json_time = time.time_ns() - json_start
-                    
-                    # Calculate latency if send_time is present
-                    if 'send_time' in message:
-                        send_time_ns = int(message['send_time'] * 1_000_000_000) if isinstance(message['send_time'], float) else message['send_time']
-                        latency_ns = time.time_ns() - send_time_ns
-                        stats.add_latency(latency_ns)
-                        
-                        print(f"\nReceived from {addr[0]}:{addr[1]}")
-                        print(f"Message: {json.dumps(message, indent=2)}")
-                        print(f"Timing (ns):")
-                        print(f"  Network receive: {recv_time:,}")
-                        print(f"  UTF-8 decoding: {decode_time:,}")
-                        print(f"  JSON parsing: {json_time:,}")
-                        print(f"  Total processing: {recv_time + decode_time + json_time:,}")
-                        print(f"  End-to-end latency: {latency_ns:,}")
-                        print(f"Stats: {stats.get_stats()}")
-                
-                elif format_type == 'binary':
-                    # Measure binary decoding time
-                    decode_start = time.time_ns()
-                    message = decode_binary_message(data)
-                    decode_time = time.time_ns() - decode_start
-                    
-                    # Calculate latency
-                    latency_ns = time.time_ns() - message['send_time']
-                    stats.add_latency(latency_ns)
-                    
-                    print(f"\nReceived from {addr[0]}:{addr[1]}")
-                    print(f"Message: {json.dumps(message, indent=2)}")
-                    print(f"Timing (ns):")
-                    print(f"  Network receive: {recv_time:,}")
-                    print(f"  Binary decoding: {decode_time:,}")
-                    print(f"  Total processing: {recv_time + decode_time:,}")
-                    print(f"  End-to-end latency: {latency_ns:,}")
+            def handle(data, addr, recv_ts, recv_time):
+                nonlocal next_report
+                record(data, recv_ts, stats)
+                if recv_ts >= next_report:
                     print(f"Stats: {stats.get_stats()}")
-                
-            except (json.JSONDecodeError, struct.error) as e:
-                print(f"\nReceived from {addr[0]}:{addr[1]}")
-                print(f"Error decoding message: {e}")
-                print(f"Raw data: {' '.join(f'{b:02x}' for b in data)}")
-                print(f"Length: {len(data)} bytes")
-                print(f"Timing (ns):")
-                print(f"  Network receive: {recv_time:,}")
+                    next_report = recv_ts + STATS_REPORT_INTERVAL_NS
+        elif format_type == 'msgpack':
+            handle = functools.partial(_handle_json, stats=stats, print_every=print_every,
+                                       loads=_msgpack_loads, parse_label="MessagePack parsing",
+                                       profile=profile)
+        else:
+            handle = functools.partial(_handle_json if format_type == 'json' else _handle_binary,
+                                       stats=stats, print_every=print_every, profile=profile)
+        
+        if threaded:
+            # The consumer thread is the only one touching stats, so no lock is needed
+            recv_queue = ReceiveQueue()
+            consumer = threading.Thread(target=recv_queue.consume, args=(handle,),
+                                        name='multicast-consumer', daemon=True)
+            consumer.start()
+            handle = recv_queue.put
+        
+        if compiled:
+            # The extension owns the receive/decode/stats loop and only calls
+            # back into Python to print
+            report = (lambda: print(f"Stats: {stats.get_stats()}")) if stats_only else None
+            _fast_listener.run_loop(sock.fileno(), stats, None if stats_only else handle,
+                                    print_every, report, STATS_REPORT_INTERVAL_NS)
+            return
+        
+        if io_uring:
+            receiver = IoUringReceiver(sock)
+        elif selector:
+            receiver = SelectorReceiver(sock)
+        else:
+            receiver = BatchReceiver(sock)
+        # Bind hot-loop callables to locals
+        recv = receiver.recv
+        time_ns = time.time_ns
+        now = _now
+        recv_time = None
+        while True:
+            if timing:
+                # Measure network receive time (one syscall per batch)
+                recv_start = now()
+                batch = recv()
+                recv_ts = time_ns()
+                recv_time = now() - recv_start
+            else:
+                # Only the receive timestamp needed for end-to-end latency
+                batch = recv()
+                recv_ts = time_ns()
             
-            print("-" * 50)
+            for data, addr in batch:
+                handle(data, addr, recv_ts, recv_time)
             
     except KeyboardInterrupt:
         print("\nStopping multicast listener...")
@@ -214,6 +827,13 @@ def listen_for_multicast(group: str, port: int, format_type: str = 'json', inter
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
     finally:
+        if consumer is not None:
+            recv_queue.close()
+            consumer.join()
+        if stats_only and stats is not None:
+            print(f"Stats: {stats.get_stats()}")
+        if isinstance(receiver, (IoUringReceiver, SelectorReceiver)):
+            receiver.close()
         sock.close()
 
 
@@ -222,10 +842,35 @@ def main():
     parser = argparse.ArgumentParser(description='Multicast listener that processes messages')
     parser.add_argument('group', help='Multicast group address (e.g., 239.0.0.1)')
     parser.add_argument('port', type=int, help='Port number to listen on')
-    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+    parser.add_argument('--format', choices=['json', 'binary', 'msgpack'], default='json',
                        help='Message format (default: json)')
     parser.add_argument('--interface', type=str,
                        help='Interface to listen for multicast packets on (IP address or interface name)')
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument('--io-uring', action='store_true',
+                        help='Receive with an io_uring multishot recvmsg (Linux 6.1+)')
+    backend.add_argument('--selector', action='store_true',
+                        help='Wait with epoll/select and drain all queued datagrams per wakeup')
+    backend.add_argument('--compiled', action='store_true',
+                        help='Run the binary receive loop in the Cython _fast_listener extension '
+                             '(build with: cythonize -3 -i src/_fast_listener.pyx)')
+    parser.add_argument('--threaded', action='store_true',
+                       help='Decode and print on a separate consumer thread, keeping the receive loop to receive + timestamp')
+    parser.add_argument('--stats-only', action='store_true',
+                       help='Only track latency; print a stats summary once per second instead of every message')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF,
+                       help=f'Socket receive buffer size in bytes, 0 for the system default (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--busy-poll', type=int,
+                       help='Busy-poll the NIC for up to this many microseconds per receive (Linux, needs CAP_NET_ADMIN)')
+    timing = parser.add_mutually_exclusive_group()
+    timing.add_argument('--no-timing', action='store_true',
+                        help='Skip the receive timing and only measure end-to-end latency')
+    timing.add_argument('--profile', action='store_true',
+                        help='Also measure and print the decode/parse timing breakdown')
+    parser.add_argument('--cpu', type=int,
+                       help='Pin the listener to this CPU and set SO_INCOMING_CPU; use the CPU that handles the NIC IRQ (Linux)')
+    parser.add_argument('--print-every', type=int, default=100,
+                       help='Print every Nth message; latency stats still include all messages (default: 100)')
     # parser.add_argument('--list-interfaces', action='store_true',
     #                    help='List available network interfaces and exit')
     
@@ -235,7 +880,19 @@ def main():
     #     list_available_interfaces()
     #     sys.exit(0)
     
-    listen_for_multicast(args.group, args.port, args.format, args.interface)
+    if args.format == 'msgpack' and msgpack is None:
+        parser.error("--format msgpack requires the msgpack package (pip install msgpack)")
+    if args.print_every < 1:
+        parser.error("--print-every must be at least 1")
+    if args.compiled:
+        if _fast_listener is None:
+            parser.error("--compiled requires the extension: cythonize -3 -i src/_fast_listener.pyx")
+        if args.format != 'binary' or args.threaded or args.profile:
+            parser.error("--compiled only supports --format binary without --threaded or --profile")
+    
+    listen_for_multicast(args.group, args.port, args.format, args.interface, args.io_uring, args.threaded,
+                         args.stats_only, args.rcvbuf, args.busy_poll, args.profile,
+                         args.print_every, args.selector, args.compiled, args.cpu, not args.no_timing)
 
 
 if __name__ == '__main__':
@@ -6,22 +6,464 @@ import socket
 import json
 import struct
 import argparse
+import ctypes
+import errno
+import functools
+import os
 import sys
 import time
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Optional, for listing interfaces when --interface is wrong
+try:
+    import netifaces
+except ImportError:
+    netifaces = None
+
+# Shared ctypes socket/io_uring ABI; plain import when run as a script from src/
+try:
+    from . import _linux_abi as abi
+except ImportError:
+    import _linux_abi as abi
+
+# Optional Cython build of the binary encoder (see _packer.pyx)
+try:
+    from . import _packer
+except ImportError:
+    try:
+        import _packer
+    except ImportError:
+        _packer = None
+
+# Fixed JSON layout of create_message() output; %a renders floats/ints as json does
+_JSON_TEMPLATE = (b'{"send_time":%d,"counter":%d,'
+                  b'"data":{"temperature":%a,"humidity":%a,"status":%d}}')
+_JSON_TEMPLATE_TS = (b'{"send_time":%d,"counter":%d,'
+                     b'"data":{"temperature":%a,"humidity":%a,"status":%d},"timestamp":"%s"}')
+_JSON_TEMPLATE_COMPACT = b'{"t":%d,"c":%d,"tmp":%d,"hum":%d,"st":%d}'
+# Exact key sets each template covers; messages with other keys are not templated
+_JSON_KEYS = frozenset(('send_time', 'counter', 'data'))
+_JSON_KEYS_TS = frozenset(('send_time', 'counter', 'data', 'timestamp'))
+_JSON_KEYS_COMPACT = frozenset(('t', 'c', 'tmp', 'hum', 'st'))
+_JSON_DATA_KEYS = frozenset(('temperature', 'humidity', 'status'))
+_JSON_NUMBER_TYPES = (int, float)
+
+
+def encode_json_message(message: dict) -> bytes:
+    """Serialize a create_message() message by filling a byte template instead of json.dumps."""
+    keys = message.keys()
+    if keys == _JSON_KEYS_COMPACT:
+        # create_compact_message() layout; every field is an integer
+        if (type(message['t']) is int and type(message['c']) is int and type(message['tmp']) is int
+                and type(message['hum']) is int and type(message['st']) is int):
+            return _JSON_TEMPLATE_COMPACT % (message['t'], message['c'], message['tmp'],
+                                             message['hum'], message['st'])
+    elif keys == _JSON_KEYS or keys == _JSON_KEYS_TS:
+        data = message['data']
+        # %d truncates floats and %a writes Python reprs, so only exact types are templated
+        if (type(data) is dict and data.keys() == _JSON_DATA_KEYS
+                and type(message['send_time']) is int and type(message['counter']) is int
+                and type(data['temperature']) in _JSON_NUMBER_TYPES
+                and type(data['humidity']) in _JSON_NUMBER_TYPES
+                and type(data['status']) is int
+                and (keys == _JSON_KEYS or type(message['timestamp']) is str)):
+            if keys == _JSON_KEYS:
+                return _JSON_TEMPLATE % (message['send_time'], message['counter'],
+                                         data['temperature'], data['humidity'], data['status'])
+            return _JSON_TEMPLATE_TS % (message['send_time'], message['counter'],
+                                        data['temperature'], data['humidity'], data['status'],
+                                        message['timestamp'].encode('ascii'))
+    # Anything else goes through the generic serializer
+    return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+
+# orjson serializes straight to UTF-8 bytes and beats the template; without it
+# the template is several times faster than json.dumps
+_json_dumps = orjson.dumps if orjson is not None else encode_json_message
+
+_msgpack_dumps = functools.partial(msgpack.packb, use_bin_type=True) if msgpack is not None else None
+
+# Binary message layout: network byte order (!), unsigned long long, int, short, short, unsigned char;
+# temperature and humidity travel as int16 tenths, covering -3276.8..3276.7 at 0.1 resolution
+_MSG_STRUCT = struct.Struct('!QIhhB')
+# create_message() stores the status as this code; 'active'/'inactive' strings are still accepted
+STATUS_ACTIVE = 1
+_STATUS_ACTIVE_NAME = 'active'
+
+
+def _pack_fields(send_time: int, counter: int, temperature: float, humidity: float, status: int) -> bytes:
+    """Pack message fields, scaling temperature and humidity to tenths; same as _packer.pack_msg()."""
+    return _MSG_STRUCT.pack(send_time, counter, round(temperature * 10), round(humidity * 10), status)
+
+
+def _pack_fields_into(buffer, offset: int, send_time: int, counter: int, temperature: float,
+                      humidity: float, status: int) -> int:
+    """Like _pack_fields(), but pack into buffer at offset; same as _packer.pack_msg_into()."""
+    _MSG_STRUCT.pack_into(buffer, offset, send_time, counter, round(temperature * 10), round(humidity * 10), status)
+    return _MSG_STRUCT.size
+
+
+# The compiled packer also does the scaling to tenths in C
+_pack_message = _packer.pack_msg if _packer is not None else _pack_fields
+_pack_message_into = _packer.pack_msg_into if _packer is not None else _pack_fields_into
+
+# Send batching: payloads are copied into SEND_BUFFER_SIZE slots for sendmmsg(2)
+SEND_BUFFER_SIZE = 2048
+
+# Socket tuning defaults; 0xB8 is DSCP EF (expedited forwarding)
+DEFAULT_SNDBUF = 4 * 1024 * 1024
+DEFAULT_TOS = 0xB8
+
+# MSG_ZEROCOPY (Linux 5.0+ for UDP); the socket module lacks the constants.
+# Pinning pages and reaping completions costs more than copying small payloads
+SO_ZEROCOPY = getattr(socket, 'SO_ZEROCOPY', 60)
+MSG_ZEROCOPY = getattr(socket, 'MSG_ZEROCOPY', 0x4000000)
+ZEROCOPY_THRESHOLD = 1024
+# struct sock_extended_err from the error queue
+_SOCK_EXTENDED_ERR = struct.Struct('=IBBBBII')
+SO_EE_ORIGIN_ZEROCOPY = 5
+SO_EE_CODE_ZEROCOPY_COPIED = 1
+
+
+_sendmmsg = None
+if abi.libc is not None:
+    try:
+        _sendmmsg = abi.libc.sendmmsg
+        _sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        _sendmmsg.restype = ctypes.c_int
+    except AttributeError:
+        _sendmmsg = None
+
+IO_URING_SLOTS = 256
+
+
+class BatchSender:
+    """Send multiple datagrams to one destination per syscall using sendmmsg(2).
+    
+    Payloads are copied into a preallocated arena that a persistent array of
+    mmsghdr/iovec structs points into, so only the lengths change per batch.
+    On platforms without sendmmsg this falls back to a send() loop, or a
+    sendto() loop if the socket is not connected.
+    """
+    def __init__(self, sock, group: str, port: int, batch_size: int, buffer_size=SEND_BUFFER_SIZE):
+        self.sock = sock
+        self.address = (group, port)
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        if _sendmmsg is None:
+            # sendto() with an address fails with EISCONN on a connected socket (macOS/BSD)
+            try:
+                sock.getpeername()
+                self._send_one = sock.send
+            except OSError:
+                self._send_one = lambda payload: sock.sendto(payload, self.address)
+            # Scratch buffer reused by send_encoded()'s fallback loop
+            self._scratch = bytearray(buffer_size)
+            self._scratch_view = memoryview(self._scratch)
+            return
+        
+        self._arena = bytearray(batch_size * buffer_size)
+        base = ctypes.addressof((ctypes.c_char * len(self._arena)).from_buffer(self._arena))
+        self._dest = abi.SockAddrIn()
+        self._dest.sin_family = socket.AF_INET
+        self._dest.sin_port = socket.htons(port)
+        self._dest.sin_addr[:] = socket.inet_aton(group)
+        self._iovecs = (abi.IOVec * batch_size)()
+        self._msgs = (abi.MMsgHdr * batch_size)()
+        for i in range(batch_size):
+            self._iovecs[i].iov_base = base + i * buffer_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._dest)
+            hdr.msg_namelen = ctypes.sizeof(abi.SockAddrIn)
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+    
+    def send(self, payloads) -> None:
+        """Send up to batch_size payloads, one datagram each."""
+        count = len(payloads)
+        if count > self.batch_size:
+            raise ValueError(f"Batch of {count} messages exceeds batch size {self.batch_size}")
+        if _sendmmsg is None:
+            for payload in payloads:
+                self._send_one(payload)
+            return
+        
+        for i, payload in enumerate(payloads):
+            length = len(payload)
+            if length > self.buffer_size:
+                raise ValueError(f"Message of {length} bytes exceeds buffer size {self.buffer_size}")
+            offset = i * self.buffer_size
+            self._arena[offset:offset + length] = payload
+            self._iovecs[i].iov_len = length
+        self._flush(count)
+    
+    def send_encoded(self, messages, encode_into) -> int:
+        """Encode up to batch_size messages straight into the send buffers and send them.
+        
+        encode_into(message, buffer, offset) writes one message at offset and
+        returns its length, so no intermediate bytes object is created or
+        copied. Returns the number of bytes sent.
+        """
+        count = len(messages)
+        if count > self.batch_size:
+            raise ValueError(f"Batch of {count} messages exceeds batch size {self.batch_size}")
+        if _sendmmsg is None:
+            total = 0
+            for message in messages:
+                length = encode_into(message, self._scratch, 0)
+                self._send_one(self._scratch_view[:length])
+                total += length
+            return total
+        
+        total = 0
+        for i, message in enumerate(messages):
+            length = encode_into(message, self._arena, i * self.buffer_size)
+            self._iovecs[i].iov_len = length
+            total += length
+        self._flush(count)
+        return total
+    
+    def _flush(self, count: int) -> None:
+        """Send the first count prepared messages with sendmmsg."""
+        # sendmmsg may send fewer messages than requested; resubmit the rest
+        sent = 0
+        base = ctypes.addressof(self._msgs)
+        while sent < count:
+            result = _sendmmsg(self.sock.fileno(), base + sent * ctypes.sizeof(abi.MMsgHdr), count - sent, 0)
+            if result < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                raise OSError(err, os.strerror(err))
+            sent += result
+
+
+class IoUringSender:
+    """Send datagrams to one destination as io_uring sendmsg submissions (Linux 6.1+).
+    
+    Each payload is copied into one of a fixed set of slots with a persistent
+    msghdr/iovec, queued as an SQE and submitted with one io_uring_enter()
+    per send() call. send() returns without waiting for the sends to finish;
+    completions are reaped on later calls, and a slot is reused once its
+    completion arrives. Errors of earlier sends are raised from a later
+    send() or close(). The ring is created with SINGLE_ISSUER, so it must
+    only be used from the thread that created it.
+    """
+    def __init__(self, sock, group: str, port: int, slots=IO_URING_SLOTS, buffer_size=SEND_BUFFER_SIZE):
+        self.sock = sock
+        self.address = (group, port)
+        self.buffer_size = buffer_size
+        
+        self._ring = abi.IoUring(slots)
+        self._ring_fd = self._ring.fd
+        self._sq_tail, self._sq_mask = self._ring.sq_tail, self._ring.sq_mask
+        self._sq_array, self._sqes = self._ring.sq_array, self._ring.sqes
+        self._cq_head, self._cq_tail = self._ring.cq_head, self._ring.cq_tail
+        self._cq_mask, self._cqes = self._ring.cq_mask, self._ring.cqes
+        
+        # One slot per SQ entry, each with its own payload buffer and msghdr
+        slots = self._ring.sq_entries
+        self._arena = bytearray(slots * buffer_size)
+        base = ctypes.addressof((ctypes.c_char * len(self._arena)).from_buffer(self._arena))
+        self._dest = abi.SockAddrIn()
+        self._dest.sin_family = socket.AF_INET
+        self._dest.sin_port = socket.htons(port)
+        self._dest.sin_addr[:] = socket.inet_aton(group)
+        self._iovecs = (abi.IOVec * slots)()
+        self._msgs = (abi.MsgHdr * slots)()
+        for i in range(slots):
+            self._iovecs[i].iov_base = base + i * buffer_size
+            self._msgs[i].msg_name = ctypes.addressof(self._dest)
+            self._msgs[i].msg_namelen = ctypes.sizeof(abi.SockAddrIn)
+            self._msgs[i].msg_iov = ctypes.pointer(self._iovecs[i])
+            self._msgs[i].msg_iovlen = 1
+        self._free = list(range(slots))
+        self._to_submit = 0
+        self._error = None
+    
+    def _enter(self, wait: int) -> None:
+        """Submit queued SQEs and reap completions, waiting for at least wait of them."""
+        while True:
+            ret = abi.libc.syscall(abi.NR_IO_URING_ENTER, ctypes.c_uint(self._ring_fd), ctypes.c_uint(self._to_submit),
+                                    ctypes.c_uint(wait), ctypes.c_uint(abi.IORING_ENTER_GETEVENTS), None, ctypes.c_size_t(0))
+            if ret >= 0:
+                break
+            err = ctypes.get_errno()
+            if err != errno.EINTR:
+                raise OSError(err, f"io_uring_enter failed: {os.strerror(err)}")
+        self._to_submit -= ret
+        
+        head, tail = self._cq_head.value, self._cq_tail.value
+        while head != tail:
+            cqe = self._cqes[head & self._cq_mask]
+            if cqe.res < 0 and self._error is None:
+                self._error = OSError(-cqe.res, f"io_uring sendmsg failed: {os.strerror(-cqe.res)}")
+            self._free.append(cqe.user_data)
+            head += 1
+        self._cq_head.value = head
+    
+    def _raise_error(self) -> None:
+        """Raise the first error reported by a completion since the last call."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+    
+    def send(self, payloads) -> None:
+        """Queue one datagram per payload and submit them without waiting for completion."""
+        for payload in payloads:
+            length = len(payload)
+            if length > self.buffer_size:
+                raise ValueError(f"Message of {length} bytes exceeds buffer size {self.buffer_size}")
+            slot = self._take_slot()
+            offset = slot * self.buffer_size
+            self._arena[offset:offset + length] = payload
+            self._queue(slot, length)
+        
+        self._enter(0)
+        self._raise_error()
+    
+    def send_encoded(self, messages, encode_into) -> int:
+        """Encode messages straight into free slots and submit them without waiting.
+        
+        encode_into(message, buffer, offset) writes one message at offset and
+        returns its length. Returns the number of bytes queued.
+        """
+        total = 0
+        for message in messages:
+            slot = self._take_slot()
+            length = encode_into(message, self._arena, slot * self.buffer_size)
+            self._queue(slot, length)
+            total += length
+        
+        self._enter(0)
+        self._raise_error()
+        return total
+    
+    def _take_slot(self) -> int:
+        """Return a free slot, waiting for an in-flight send to finish if there is none."""
+        if not self._free:
+            # Every slot is in flight; submit what is queued and wait for one to finish
+            self._enter(1)
+        return self._free.pop()
+    
+    def _queue(self, slot: int, length: int) -> None:
+        """Queue a sendmsg SQE for the first length bytes of slot."""
+        self._iovecs[slot].iov_len = length
+        tail = self._sq_tail.value
+        index = tail & self._sq_mask
+        ctypes.memset(ctypes.byref(self._sqes[index]), 0, ctypes.sizeof(abi.IoUringSqe))
+        sqe = self._sqes[index]
+        sqe.opcode = abi.IORING_OP_SENDMSG
+        sqe.fd = self.sock.fileno()
+        sqe.addr = ctypes.addressof(self._msgs[slot])
+        sqe.len = 1
+        sqe.user_data = slot
+        self._sq_array[index] = index
+        self._sq_tail.value = tail + 1
+        self._to_submit += 1
+    
+    def close(self) -> None:
+        """Wait for in-flight sends, then tear down the ring and release its mappings."""
+        try:
+            while len(self._free) < len(self._msgs):
+                self._enter(1)
+            self._raise_error()
+        finally:
+            self._sqes = self._cqes = None
+            self._sq_tail = self._sq_array = self._cq_head = self._cq_tail = None
+            self._ring.close()
+
+
+class ZeroCopySender:
+    """Send datagrams of at least threshold bytes with MSG_ZEROCOPY.
+    
+    Drop-in for the socket in send_message(): only send() is provided.
+    The kernel sends straight from the payload's pages, so every payload is
+    kept alive until its completion is reaped from the socket error queue,
+    which happens before each send. Smaller payloads are copied as usual.
+    """
+    def __init__(self, sock, threshold: int = ZEROCOPY_THRESHOLD):
+        sock.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+        self.sock = sock
+        self.threshold = threshold
+        # Zerocopy sends are numbered by the kernel, starting at 0
+        self._pending = {}
+        self._next_id = 0
+        # Completions the kernel had to copy anyway (e.g. looped back to a local listener)
+        self.copied = 0
+    
+    def send(self, data) -> int:
+        """Send one datagram, without a copy if it is large enough; returns the bytes sent."""
+        if self._pending:
+            self._reap()
+        if len(data) < self.threshold:
+            return self.sock.send(data)
+        try:
+            sent = self.sock.send(data, MSG_ZEROCOPY)
+        except OSError as e:
+            # Out of pinned-memory budget (net.core.optmem_max): copy this one
+            if e.errno != errno.ENOBUFS:
+                raise
+            return self.sock.send(data)
+        self._pending[self._next_id] = data
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        return sent
+    
+    def _reap(self) -> None:
+        """Release the payloads of every completed send without blocking."""
+        while True:
+            try:
+                _, ancdata, _, _ = self.sock.recvmsg(0, 128, socket.MSG_ERRQUEUE | socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return
+            for _, _, cmsg in ancdata:
+                _, origin, _, code, _, first, last = _SOCK_EXTENDED_ERR.unpack_from(cmsg)
+                if origin != SO_EE_ORIGIN_ZEROCOPY:
+                    continue
+                # Completions cover the send ids first..last, which wrap at 32 bits
+                count = ((last - first) & 0xFFFFFFFF) + 1
+                for i in range(count):
+                    self._pending.pop((first + i) & 0xFFFFFFFF, None)
+                if code == SO_EE_CODE_ZEROCOPY_COPIED:
+                    self.copied += count
+    
+    def close(self, timeout: float = 1.0) -> None:
+        """Wait up to timeout seconds for in-flight sends to complete."""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            self._reap()
+            if self._pending:
+                time.sleep(0.001)
+
+
+@functools.lru_cache(maxsize=1)
+def get_available_interfaces():
+    """Return (interface, IPv4 address) pairs, enumerated once; None without netifaces."""
+    if netifaces is None:
+        return None
+    return tuple((iface, addr['addr'])
+                 for iface in netifaces.interfaces()
+                 for addr in netifaces.ifaddresses(iface).get(netifaces.AF_INET, ()))
+
 
 def list_available_interfaces():
     """List all available network interfaces and their IP addresses."""
     print("\nAvailable network interfaces:")
-    try:
-        import netifaces
-        for iface in netifaces.interfaces():
-            addrs = netifaces.ifaddresses(iface)
-            if netifaces.AF_INET in addrs:
-                for addr in addrs[netifaces.AF_INET]:
-                    print(f"  {iface}: {addr['addr']}")
-    except ImportError:
+    interfaces = get_available_interfaces()
+    if interfaces is not None:
+        for iface, ip in interfaces:
+            print(f"  {iface}: {ip}")
+    else:
         print("  Install netifaces package for detailed interface information:")
         print("  pip install netifaces")
         # Fallback to basic interface listing
@@ -35,7 +477,9 @@ def list_available_interfaces():
             print("  Could not list interfaces. Please install netifaces package.")
 
 
-def create_multicast_sender(group: str, port: int, ttl: int = 1, interface: str = None) -> socket.socket:
+def create_multicast_sender(group: str, port: int, ttl: int = 1, interface: str = None,
+                            sndbuf: int = DEFAULT_SNDBUF, tos: int = DEFAULT_TOS,
+                            loopback: bool = True) -> socket.socket:
     """Create and configure a socket for multicast sending."""
     # Create UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
@@ -43,6 +487,26 @@ def create_multicast_sender(group: str, port: int, ttl: int = 1, interface: str
     # Set TTL
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
     
+    # Without loopback the kernel skips delivering a copy of every packet to
+    # listeners on this host, which also means they stop receiving it
+    if not loopback:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 0)
+    
+    # Large send buffer so bursts queue in the kernel instead of blocking send()
+    if sndbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        # Linux reports double the usable size, capped by net.core.wmem_max
+        actual = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        if sys.platform.startswith('linux'):
+            actual //= 2
+        if actual < sndbuf:
+            print(f"Send buffer limited to {actual:,} bytes (requested {sndbuf:,}); "
+                  f"raise net.core.wmem_max to allow more")
+    
+    # Mark packets for low-latency queuing on the host and DSCP-aware switches
+    if tos:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, tos)
+    
     # Set interface if specified
     if interface:
         try:
@@ -60,6 +524,10 @@ def create_multicast_sender(group: str, port: int, ttl: int = 1, interface: str
                 list_available_interfaces()
                 raise
     
+    # Fix the destination once so each send() skips the per-packet address
+    # copy and route lookup that sendto() does
+    sock.connect((group, port))
+    
     return sock
 
 
@@ -68,83 +536,300 @@ def encode_binary_message(message: dict) -> bytes:
     # Format: 
     # - 8 bytes: timestamp (Q - unsigned long long)
     # - 4 bytes: counter (I - unsigned int)
-    # - 4 bytes: temperature (f - float)
-    # - 4 bytes: humidity (f - float)
+    # - 2 bytes: temperature in tenths (h - signed short)
+    # - 2 bytes: humidity in tenths (h - signed short)
     # - 1 byte: status (B - unsigned char, 1 for active, 0 for inactive)
-    return struct.pack(
-        '!QIffB',  # Network byte order (!), unsigned long long, int, float, float, unsigned char
+    data = message['data']
+    status = data['status']
+    if type(status) is str:
+        # Status given as an 'active'/'inactive' string; bool packs as 1/0
+        status = status == _STATUS_ACTIVE_NAME
+    return _pack_message(
         message['send_time'],
         message['counter'],
-        message['data']['temperature'],
-        message['data']['humidity'],
-        1 if message['data']['status'] == 'active' else 0
+        data['temperature'],
+        data['humidity'],
+        status
     )
 
 
-def send_message(sock: socket.socket, group: str, port: int, message: dict, format_type: str) -> None:
-    """Send a message to the multicast group in the specified format."""
+def encode_binary_message_into(message: dict, buffer, offset: int = 0) -> int:
+    """Pack message in binary format into buffer at offset without allocating; returns its length."""
+    data = message['data']
+    status = data['status']
+    if type(status) is str:
+        status = status == _STATUS_ACTIVE_NAME
+    return _pack_message_into(buffer, offset, message['send_time'], message['counter'],
+                              data['temperature'], data['humidity'], status)
+
+
+# Per-send timing output, written with a single call
+_MESSAGE_REPORT = ("Timing (ns):\n"
+                   "  {label}: {serialize:,}\n"
+                   "  Network send: {send:,}\n"
+                   "  Total processing: {total:,}\n"
+                   "Message length: {length} bytes\n" + "-" * 50 + "\n")
+_BATCH_REPORT = ("Timing (ns):\n"
+                 "  {label}: {serialize:,}\n"
+                 "  Network send ({count} messages): {send:,}\n"
+                 "  Total processing: {total:,}\n"
+                 "Batch length: {length} bytes\n" + "-" * 50 + "\n")
+
+# How often the aggregate send rate is printed
+STATS_REPORT_INTERVAL = 1.0
+
+# Timing label and serializer for each --format
+_SERIALIZERS = {
+    'json': ("JSON serialization", _json_dumps),
+    'binary': ("Binary encoding", encode_binary_message),
+    'msgpack': ("MessagePack serialization", _msgpack_dumps),
+}
+
+
+def send_message(sock: socket.socket, group: str, port: int, message: dict, format_type: str,
+                 verbose: bool = True) -> int:
+    """Send a message to the multicast group in the specified format.
+    
+    sock must be connected to the group, as done by create_multicast_sender();
+    group and port are only kept for compatibility. Timing is only measured and
+    printed when verbose is set. Returns the number of bytes sent.
+    """
     try:
-        if format_type == 'json':
-            # Measure JSON serialization time
-            json_start = time.time_ns()
-            json_str = json.dumps(message)
-            json_time = time.time_ns() - json_start
-            
-            # Measure encoding time
-            encode_start = time.time_ns()
-            data = json_str.encode('utf-8')
-            encode_time = time.time_ns() - encode_start
-            
-            # Measure network send time
-            send_start = time.time_ns()
-            sock.sendto(data, (group, port))
-            send_time = time.time_ns() - send_start
-            
-            # Print timing information
-            print(f"Timing (ns):")
-            print(f"  JSON serialization: {json_time:,}")
-            print(f"  UTF-8 encoding: {encode_time:,}")
-            print(f"  Network send: {send_time:,}")
-            print(f"  Total processing: {json_time + encode_time + send_time:,}")
-            
-        elif format_type == 'binary':
-            # Measure binary encoding time
-            encode_start = time.time_ns()
-            data = encode_binary_message(message)
-            encode_time = time.time_ns() - encode_start
-            
-            # Measure network send time
-            send_start = time.time_ns()
-            sock.sendto(data, (group, port))
-            send_time = time.time_ns() - send_start
-            
-            # Print timing information
-            print(f"Timing (ns):")
-            print(f"  Binary encoding: {encode_time:,}")
-            print(f"  Network send: {send_time:,}")
-            print(f"  Total processing: {encode_time + send_time:,}")
-        
-        print(f"Message length: {len(data)} bytes")
-        print("-" * 50)
+        label, serialize = _SERIALIZERS[format_type]
+        if not verbose:
+            data = serialize(message)
+            sock.send(data)
+            return len(data)
+        
+        # Measure serialization time (JSON includes UTF-8 encoding)
+        serialize_start = time.time_ns()
+        data = serialize(message)
+        serialize_time = time.time_ns() - serialize_start
+        
+        # Measure network send time
+        send_start = time.time_ns()
+        sock.send(data)
+        send_time = time.time_ns() - send_start
+        
+        # Print timing information
+        sys.stdout.write(_MESSAGE_REPORT.format(label=label, serialize=serialize_time, send=send_time,
+                                                total=serialize_time + send_time, length=len(data)))
+        return len(data)
         
     except Exception as e:
         print(f"Error sending message: {e}", file=sys.stderr)
         raise
 
 
+@functools.lru_cache(maxsize=1)
+def _iso_seconds(seconds: int) -> str:
+    """ISO 8601 local time up to whole seconds; cached as it changes once a second."""
+    return datetime.fromtimestamp(seconds).isoformat(timespec='seconds')
+
+
+def format_timestamp(send_time: int) -> str:
+    """Format a nanosecond timestamp as a local ISO 8601 string with microseconds."""
+    seconds, nanoseconds = divmod(send_time, 1_000_000_000)
+    return f"{_iso_seconds(seconds)}.{nanoseconds // 1000:06d}"
+
+
+def create_message(message_count: int, include_timestamp: bool = False, message: dict = None) -> dict:
+    """Create the next message to send.
+    
+    The human-readable "timestamp" field is only added when requested; it is
+    derived from send_time rather than a second clock read. When message is
+    given, a dict previously returned by this function is updated in place and
+    returned instead of allocating a new one.
+    """
+    # Get precise timestamp in nanoseconds
+    send_time = time.time_ns()
+    
+    if message is None:
+        message = {
+            "send_time": send_time,  # Nanosecond timestamp
+            "counter": message_count,
+            "data": {
+                "temperature": 25.5 + (message_count % 10),
+                "humidity": 60 + (message_count % 20),
+                "status": STATUS_ACTIVE
+            }
+        }
+    else:
+        message["send_time"] = send_time
+        message["counter"] = message_count
+        data = message["data"]
+        data["temperature"] = 25.5 + (message_count % 10)
+        data["humidity"] = 60 + (message_count % 20)
+    if include_timestamp:
+        message["timestamp"] = format_timestamp(send_time)
+    return message
+
+
+def create_compact_message(message_count: int, include_timestamp: bool = False, message: dict = None) -> dict:
+    """Create the next message in the flat, short-key, integer-only --compact schema.
+    
+    Temperature and humidity are sent as integer tenths and the status as 1/0,
+    so serializers only take their integer fast paths. Like create_message(),
+    a previously returned message can be refilled in place.
+    """
+    send_time = time.time_ns()
+    if message is None:
+        message = {}
+    message["t"] = send_time
+    message["c"] = message_count
+    message["tmp"] = 255 + (message_count % 10) * 10
+    message["hum"] = 600 + (message_count % 20) * 10
+    message["st"] = STATUS_ACTIVE
+    if include_timestamp:
+        message["ts"] = format_timestamp(send_time)
+    return message
+
+
+def send_batch(sender: BatchSender, messages: list, format_type: str, verbose: bool = True) -> int:
+    """Encode messages and send them to the multicast group in a single batch.
+    
+    Timing is only measured and printed when verbose is set. Returns the number
+    of bytes sent.
+    """
+    try:
+        label, encode = _SERIALIZERS[format_type]
+        if not verbose:
+            if format_type == 'binary':
+                # Pack straight into the sender's buffers, skipping the bytes objects
+                return sender.send_encoded(messages, encode_binary_message_into)
+            payloads = [encode(message) for message in messages]
+            sender.send(payloads)
+            return sum(map(len, payloads))
+        
+        # Measure encoding time for the whole batch
+        encode_start = time.time_ns()
+        payloads = [encode(message) for message in messages]
+        encode_time = time.time_ns() - encode_start
+        
+        # Measure network send time (one sendmmsg per batch)
+        send_start = time.time_ns()
+        sender.send(payloads)
+        send_time = time.time_ns() - send_start
+        
+        # Print timing information
+        length = sum(map(len, payloads))
+        sys.stdout.write(_BATCH_REPORT.format(label=label, serialize=encode_time, send=send_time,
+                                              total=encode_time + send_time, count=len(payloads),
+                                              length=length))
+        return length
+        
+    except Exception as e:
+        print(f"Error sending batch: {e}", file=sys.stderr)
+        raise
+
+
+def print_send_rate(sent_messages: int, sent_bytes: int, elapsed: float):
+    """Print the aggregate send rate since the last report."""
+    print(f"Sent: {sent_messages:,} messages, {sent_bytes:,} bytes in {elapsed:.1f}s "
+          f"({sent_messages / elapsed:,.0f} msg/s)")
+
+
+def run_producer(sock: socket.socket, group: str, port: int, format_type: str, interval: float,
+                 sender=None, batch: int = 1, make_message=create_message, include_timestamp: bool = False,
+                 sample_every: int = 100, verbose: bool = False, compiled: bool = False):
+    """Send messages until interrupted, one every interval seconds (0 for back-to-back).
+    
+    With a BatchSender or IoUringSender, a batch of messages is sent per interval instead.
+    Only the send containing every sample_every-th message is timed and printed
+    unless verbose is set. compiled runs the loop for single sends in the Cython
+    _packer extension, calling back into Python only for the sampled messages.
+    """
+    step = 1 if sender is None else batch
+    # Message dicts are allocated once and refilled for every send
+    messages = [make_message(i, include_timestamp) for i in range(step)]
+    message = messages[0]
+    
+    if compiled:
+        def sample(message_count):
+            make_message(message_count, include_timestamp, message)
+            return send_message(sock, group, port, message, format_type)
+        
+        # Binary messages are packed in C; other formats go through their serializer
+        encode = None if format_type == 'binary' else _SERIALIZERS[format_type][1]
+        _packer.run_loop(sock.fileno(), message, make_message, encode, include_timestamp, interval,
+                         1 if verbose else sample_every, sample, print_send_rate, STATS_REPORT_INTERVAL)
+        return
+    
+    # Bind everything the loop touches to locals once
+    _send, _send_batch = send_message, send_batch
+    _sleep, _monotonic = time.sleep, time.monotonic
+    message_count = 0
+    # Aggregate accounting since the last once-per-second report
+    sent_messages = sent_bytes = 0
+    report_start = deadline = _monotonic()
+    while True:
+        # Time and print only sampled sends (the batch containing every Nth message)
+        sampled = verbose or -message_count % sample_every < step
+        if sender is None:
+            make_message(message_count, include_timestamp, message)
+            sent_bytes += _send(sock, group, port, message, format_type, sampled)
+        else:
+            for i, queued in enumerate(messages):
+                make_message(message_count + i, include_timestamp, queued)
+            sent_bytes += _send_batch(sender, messages, format_type, sampled)
+        message_count += step
+        sent_messages += step
+        
+        now = _monotonic()
+        if now - report_start >= STATS_REPORT_INTERVAL:
+            print_send_rate(sent_messages, sent_bytes, now - report_start)
+            sent_messages = sent_bytes = 0
+            report_start = now
+        # With interval 0 send back-to-back without a sleep syscall per iteration
+        if interval > 0:
+            # Sleep until the next deadline so send and print time don't add up into drift
+            deadline += interval
+            delay = deadline - now
+            if delay > 0:
+                _sleep(delay)
+            else:
+                # Running behind: restart the schedule instead of bursting to catch up
+                deadline = now
+
+
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(description='Multicast producer that sends messages')
     parser.add_argument('group', help='Multicast group address (e.g., 239.0.0.1)')
     parser.add_argument('port', type=int, help='Port number to send to')
     parser.add_argument('--interval', type=float, default=1.0,
-                       help='Interval between messages in seconds (default: 1.0)')
+                       help='Interval between messages in seconds, 0 to send back-to-back (default: 1.0)')
     parser.add_argument('--ttl', type=int, default=1,
                        help='Time-to-live for multicast packets (default: 1)')
-    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+    parser.add_argument('--sndbuf', type=int, default=DEFAULT_SNDBUF,
+                       help=f'Socket send buffer size in bytes, 0 for the system default (default: {DEFAULT_SNDBUF})')
+    parser.add_argument('--tos', type=lambda value: int(value, 0), default=DEFAULT_TOS,
+                       help=f'IP TOS byte for sent packets, 0 to leave unset (default: {DEFAULT_TOS:#x}, DSCP EF)')
+    parser.add_argument('--no-loopback', action='store_true',
+                       help='Disable multicast loopback; listeners on this host will not receive the messages')
+    parser.add_argument('--format', choices=['json', 'binary', 'msgpack'], default='json',
                        help='Message format (default: json)')
     parser.add_argument('--interface', type=str,
                        help='Interface to send multicast packets from (IP address or interface name)')
+    parser.add_argument('--include-human-ts', action='store_true',
+                       help='Add an ISO 8601 "timestamp" field to JSON/MessagePack messages')
+    parser.add_argument('--compact', action='store_true',
+                       help='Send JSON/MessagePack messages in a flat schema with short keys and integer values')
+    parser.add_argument('--batch', type=int, default=1,
+                       help='Number of messages to send per interval with a single sendmmsg call (default: 1)')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Print the timing breakdown of every send')
+    parser.add_argument('--sample-every', type=int, default=100,
+                       help='Print the timing breakdown of every Nth message; a send rate summary is printed every second (default: 100)')
+    parser.add_argument('--io-uring', action='store_true',
+                       help='Submit sends through io_uring without waiting for them to complete (Linux 6.1+)')
+    parser.add_argument('--compiled', action='store_true',
+                       help='Run the send loop in the Cython _packer extension '
+                            '(build with: cythonize -3 -i src/_packer.pyx)')
+    parser.add_argument('--zerocopy', action='store_true',
+                       help='Send messages of at least --zerocopy-threshold bytes with MSG_ZEROCOPY (Linux 5.0+)')
+    parser.add_argument('--zerocopy-threshold', type=int, default=ZEROCOPY_THRESHOLD,
+                       help=f'Smallest message in bytes sent without a copy under --zerocopy (default: {ZEROCOPY_THRESHOLD})')
     # parser.add_argument('--list-interfaces', action='store_true',
     #                    help='List available network interfaces and exit')
     
@@ -154,43 +839,68 @@ def main():
     #     list_available_interfaces()
     #     sys.exit(0)
     
+    if args.format == 'msgpack' and msgpack is None:
+        parser.error("--format msgpack requires the msgpack package (pip install msgpack)")
+    if args.batch < 1:
+        parser.error("--batch must be at least 1")
+    if args.sample_every < 1:
+        parser.error("--sample-every must be at least 1")
+    if not 0 <= args.tos <= 0xFF:
+        parser.error("--tos must be between 0 and 0xff")
+    if args.compact and args.format == 'binary':
+        parser.error("--compact only applies to --format json and msgpack")
+    if args.compiled:
+        if _packer is None:
+            parser.error("--compiled requires the extension: cythonize -3 -i src/_packer.pyx")
+        if args.batch > 1 or args.io_uring:
+            parser.error("--compiled only supports single sends, without --batch or --io-uring")
+    if args.zerocopy and (args.batch > 1 or args.io_uring or args.compiled):
+        parser.error("--zerocopy only supports single sends, without --batch, --io-uring or --compiled")
+    
+    sender = zerocopy = None
     try:
-        sock = create_multicast_sender(args.group, args.port, args.ttl, args.interface)
+        sock = create_multicast_sender(args.group, args.port, args.ttl, args.interface,
+                                       args.sndbuf, args.tos, not args.no_loopback)
         print(f"Sending multicast messages to {args.group}:{args.port}")
         print(f"Format: {args.format}")
         print(f"Interval: {args.interval} seconds")
+        if args.batch > 1:
+            print(f"Batch size: {args.batch}")
+        if args.io_uring:
+            print("Send backend: io_uring")
+        elif args.compiled:
+            print("Send loop: compiled")
+        if args.zerocopy:
+            print(f"Zerocopy sends from {args.zerocopy_threshold:,} bytes")
         if args.interface:
             print(f"Interface: {args.interface}")
         print("Press Ctrl+C to stop")
         print("-" * 50)
         
-        message_count = 0
-        while True:
-            # Get precise timestamp in nanoseconds
-            send_time = time.time_ns()
-            
-            # Create message
-            message = {
-                "timestamp": datetime.now().isoformat(),
-                "send_time": send_time,  # Nanosecond timestamp
-                "counter": message_count,
-                "data": {
-                    "temperature": 25.5 + (message_count % 10),
-                    "humidity": 60 + (message_count % 20),
-                    "status": "active"
-                }
-            }
-            
-            send_message(sock, args.group, args.port, message, args.format)
-            message_count += 1
-            time.sleep(args.interval)
-            
+        if args.io_uring:
+            sender = IoUringSender(sock, args.group, args.port)
+        elif args.batch > 1:
+            sender = BatchSender(sock, args.group, args.port, args.batch)
+        # Single sends go through the zerocopy wrapper in place of the socket
+        send_sock = sock
+        if args.zerocopy:
+            send_sock = zerocopy = ZeroCopySender(sock, args.zerocopy_threshold)
+        # The binary format has no timestamp string, so never build one for it
+        include_timestamp = args.include_human_ts and args.format != 'binary'
+        make_message = create_compact_message if args.compact else create_message
+        run_producer(send_sock, args.group, args.port, args.format, args.interval, sender, args.batch, make_message,
+                     include_timestamp, args.sample_every, args.verbose, args.compiled)
+    
     except KeyboardInterrupt:
         print("\nStopping multicast producer...")
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
     finally:
+        if isinstance(sender, IoUringSender):
+            sender.close()
+        if zerocopy is not None:
+            zerocopy.close()
         sock.close()
 
 
@@ -2,9 +2,13 @@
 Tests for the multicast listener.
 """
 import socket
+import sys
 import pytest
 import struct
-from src.multicast_listener import create_multicast_socket, decode_binary_message
+import random
+import functools
+from statistics import mean, stdev
+from src.multicast_listener import _handle_binary, _handle_json, create_multicast_socket, decode_binary_message, decode_binary_fields, LatencyStats, BatchReceiver, IoUringReceiver, SelectorReceiver, ReceiveQueue, SO_INCOMING_CPU
 
 
 def test_create_multicast_socket():
@@ -23,6 +27,27 @@ def test_create_multicast_socket():
     sock.close()
 
 
+def test_create_multicast_socket_rcvbuf():
+    """Test that the requested receive buffer size is applied."""
+    sock = create_multicast_socket("239.0.0.1", 12345, rcvbuf=65536)
+    
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 65536
+    
+    # Clean up
+    sock.close()
+
+
+def test_create_multicast_socket_incoming_cpu():
+    """Test that SO_INCOMING_CPU is set when a CPU is requested."""
+    sock = create_multicast_socket("239.0.0.1", 12345, incoming_cpu=0, rcvbuf=0)
+    
+    if sys.platform.startswith('linux'):
+        assert sock.getsockopt(socket.SOL_SOCKET, SO_INCOMING_CPU) == 0
+    
+    # Clean up
+    sock.close()
+
+
 def test_decode_binary_message():
     """Test binary message decoding."""
     # Create test binary data
@@ -33,11 +58,11 @@ def test_decode_binary_message():
     status = 1  # active
     
     # Use the same format string as in the producer
-    format_string = '!QIffB'  # Added extra 'f' for humidity
+    format_string = '!QIhhB'  # Temperature and humidity in tenths
     print(f"\nFormat string: {format_string}")
     print(f"Expected fields: {len(format_string) - 1}")  # -1 for the '!' character
     
-    binary_data = struct.pack(format_string, send_time, counter, temperature, humidity, status)
+    binary_data = struct.pack(format_string, send_time, counter, 255, 600, status)
     print(f"Binary data length: {len(binary_data)} bytes")
     
     # Decode message
@@ -56,12 +81,12 @@ def test_decode_binary_message_inactive():
     # Create test binary data
     send_time = 1234567890
     counter = 42
-    temperature = 25.5
-    humidity = 60.0
+    temperature = 255
+    humidity = 600
     status = 0  # inactive
     
     # Use the same format string as in the producer
-    binary_data = struct.pack('!QIffB', send_time, counter, temperature, humidity, status)
+    binary_data = struct.pack('!QIhhB', send_time, counter, temperature, humidity, status)
     
     # Decode message
     message = decode_binary_message(binary_data)
@@ -70,6 +95,15 @@ def test_decode_binary_message_inactive():
     assert message['data']['status'] == 'inactive'
 
 
+def test_decode_binary_fields():
+    """Test that the scalar fast path decodes the same fields as struct."""
+    fields = (1792004338863479799, 4_000_000_000, 255, -602, 1)
+    binary_data = struct.pack('!QIhhB', *fields)
+    
+    assert decode_binary_fields(binary_data) == fields
+    assert decode_binary_fields(memoryview(bytearray(binary_data))) == fields
+
+
 def test_decode_binary_message_invalid():
     """Test binary message decoding with invalid data."""
     # Create invalid binary data (too short)
@@ -80,7 +114,225 @@ def test_decode_binary_message_invalid():
         decode_binary_message(binary_data)
 
 
+def test_handle_binary_print_every(capsys):
+    """Test that only sampled messages are printed while all update stats."""
+    stats = LatencyStats()
+    addr = ('192.0.2.1', 5000)
+    for counter in range(5):
+        data = struct.pack('!QIhhB', 1000, counter, 255, 600, 1)
+        _handle_binary(data, addr, 1500, None, stats, print_every=2)
+    
+    assert stats.message_count == 5
+    assert capsys.readouterr().out.count("Received from") == 3
+
+
+def test_handle_msgpack(capsys):
+    """Test that MessagePack datagrams are decoded and their latency recorded."""
+    msgpack = pytest.importorskip('msgpack')
+    message = {"send_time": 1000, "counter": 1,
+               "data": {"temperature": 25.5, "humidity": 60, "status": "active"}}
+    data = msgpack.packb(message, use_bin_type=True)
+    stats = LatencyStats()
+    
+    _handle_json(data, ("127.0.0.1", 12345), 1500, 10, stats,
+                 loads=functools.partial(msgpack.unpackb, raw=False), parse_label="MessagePack parsing",
+                 profile=True)
+    
+    assert stats.latencies[-1] == 500
+    assert "MessagePack parsing" in capsys.readouterr().out
+
+
+def test_handle_binary_timing(capsys):
+    """Test that the receive time is printed by default and decode timing only when profiling."""
+    data = struct.pack('!QIhhB', 1000, 1, 255, 600, 1)
+    addr = ('192.0.2.1', 5000)
+    
+    _handle_binary(data, addr, 1500, 10, LatencyStats())
+    out = capsys.readouterr().out
+    assert "Network receive: 10" in out
+    assert "Binary decoding" not in out
+    
+    _handle_binary(data, addr, 1500, 10, LatencyStats(), profile=True)
+    assert "Binary decoding" in capsys.readouterr().out
+    
+    # --no-timing passes no receive time; only the end-to-end latency is printed
+    _handle_binary(data, addr, 1500, None, LatencyStats())
+    out = capsys.readouterr().out
+    assert "End-to-end latency: 500" in out
+    assert "Network receive" not in out
+
+
+def test_handle_binary_send_time_out_of_range(capsys):
+    """Test that a send_time whose latency does not fit in an int64 is dropped without touching the stats."""
+    addr = ('192.0.2.1', 5000)
+    recv_ts = 1_700_000_000_000_000_000
+    stats = LatencyStats(window_size=4)
+    _handle_binary(struct.pack('!QIhhB', recv_ts - 500, 0, 255, 600, 1), addr, recv_ts, None, stats)
+    capsys.readouterr()
+    
+    for send_time in (2**63 + recv_ts + 1, 2**64 - 1):
+        data = struct.pack('!QIhhB', send_time, 1, 255, 600, 1)
+        _handle_binary(data, addr, recv_ts, None, stats)
+        assert "send_time out of range" in capsys.readouterr().out
+        # Unprinted messages take the fast path and are dropped the same way
+        _handle_binary(data, addr, recv_ts, None, stats, print_every=2)
+    
+    assert stats.latencies == [500]
+    assert stats.message_count == 1
+    with pytest.raises(OverflowError):
+        stats.add_latency(-2**64)
+    assert stats.latencies == [500]
+
+
+def test_handle_json_compact_schema():
+    """Test that latency is taken from the short 't' key of the compact schema."""
+    data = b'{"t":1000,"c":1,"tmp":255,"hum":600,"st":1}'
+    stats = LatencyStats()
+    
+    _handle_json(data, ("127.0.0.1", 12345), 1500, None, stats)
+    
+    assert stats.latencies == [500]
+
+
 def test_invalid_multicast_group():
     """Test that an invalid multicast group raises an error."""
     with pytest.raises(socket.error):
-        create_multicast_socket("256.0.0.1", 12345)  # Invalid IP address 
\ No newline at end of file
+        create_multicast_socket("256.0.0.1", 12345)  # Invalid IP address 
+
+
+@pytest.mark.parametrize('use_recvmmsg', [True, False])
+def test_batch_receiver(use_recvmmsg, monkeypatch):
+    """Test that queued datagrams are returned by the batch receiver."""
+    if not use_recvmmsg:
+        # Force the portable recvfrom_into fallback
+        monkeypatch.setattr('src.multicast_listener._recvmmsg', None)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    
+    payloads = [b'first', b'second', b'third']
+    for payload in payloads:
+        sender.sendto(payload, sock.getsockname())
+    
+    receiver = BatchReceiver(sock)
+    received = []
+    while len(received) < len(payloads):
+        for data, addr in receiver.recv():
+            received.append(bytes(data))
+            assert addr[1] == sender.getsockname()[1]
+    
+    assert received == payloads
+    
+    # Clean up
+    sender.close()
+    sock.close()
+
+
+def test_selector_receiver():
+    """Test that the selector receiver drains everything queued in one wakeup, up to its pool size."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    
+    payloads = [f'message {i}'.encode() for i in range(5)]
+    for payload in payloads:
+        sender.sendto(payload, sock.getsockname())
+    
+    receiver = SelectorReceiver(sock, batch_size=3)
+    first = [bytes(data) for data, addr in receiver.recv()]
+    assert first == payloads[:3]
+    second = [bytes(data) for data, addr in receiver.recv()]
+    assert second == payloads[3:]
+    
+    # Clean up
+    receiver.close()
+    sender.close()
+    sock.close()
+
+
+def test_io_uring_receiver():
+    """Test that the io_uring receiver returns datagrams and recycles its buffers."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    
+    try:
+        receiver = IoUringReceiver(sock, buffers=4)
+    except OSError as e:
+        sock.close()
+        sender.close()
+        pytest.skip(f"io_uring not available: {e}")
+    
+    # Send more datagrams than there are buffers to exercise recycling
+    payloads = [f'message {i}'.encode() for i in range(10)]
+    for payload in payloads:
+        sender.sendto(payload, sock.getsockname())
+    
+    received = []
+    while len(received) < len(payloads):
+        for data, addr in receiver.recv():
+            received.append(bytes(data))
+            assert addr[1] == sender.getsockname()[1]
+    
+    assert received == payloads
+    
+    # Clean up
+    receiver.close()
+    sender.close()
+    sock.close()
+
+
+def test_receive_queue():
+    """Test that queued datagrams reach the consumer intact and in order."""
+    recv_queue = ReceiveQueue(depth=2)
+    addr = ('192.0.2.1', 5000)
+    
+    recv_queue.put(b'first', addr, 100, 10)
+    recv_queue.put(b'second', addr, 200, 20)
+    recv_queue.close()
+    
+    received = []
+    recv_queue.consume(lambda data, addr, recv_ts, recv_time: received.append((bytes(data), addr, recv_ts, recv_time)))
+    assert received == [(b'first', addr, 100, 10), (b'second', addr, 200, 20)]
+    
+    # Slots are returned to the pool once consumed
+    recv_queue.put(b'third', addr, 300, 30)
+    recv_queue.close()
+    received.clear()
+    recv_queue.consume(lambda data, addr, recv_ts, recv_time: received.append(bytes(data)))
+    assert received == [b'third']
+
+
+def test_latency_stats_sliding_window():
+    """Test that incremental stats match a full recomputation over the window."""
+    stats = LatencyStats(window_size=10)
+    assert stats.get_stats() == "No messages received yet"
+    
+    rng = random.Random(42)
+    latencies = [rng.randint(100_000, 2_000_000_000) for _ in range(57)]
+    for i, latency in enumerate(latencies):
+        stats.add_latency(latency)
+        window = latencies[max(0, i - 9):i + 1]
+        std = stdev(window) if len(window) > 1 else 0
+        assert stats.get_stats() == (f"Latency: {latency:,}ns (current) | "
+                                     f"{mean(window):,.0f}ns (avg) | "
+                                     f"{std:,.0f}ns (std) | "
+                                     f"{min(window):,}ns (min) | "
+                                     f"{max(window):,}ns (max) | "
+                                     f"Messages: {i + 1}")
+
+
+def test_compiled_latency_stats():
+    """Test that the Cython stats, when built, report the same as LatencyStats."""
+    fast_listener = pytest.importorskip('src._fast_listener')
+    stats = LatencyStats(window_size=10)
+    compiled = fast_listener.CLatencyStats(10)
+    assert compiled.get_stats() == "No messages received yet"
+    
+    rng = random.Random(7)
+    for _ in range(33):
+        latency = rng.randint(100_000, 2_000_000)
+        stats.add_latency(latency)
+        compiled.add_latency(latency)
+        assert compiled.get_stats() == stats.get_stats()
+    assert compiled.latencies == list(stats.latencies)
@@ -4,8 +4,10 @@ Tests for the multicast producer.
 import socket
 import pytest
 import struct
+import json
+from datetime import datetime
 from unittest.mock import patch, MagicMock
-from src.multicast_producer import create_multicast_sender, encode_binary_message, send_message
+from src.multicast_producer import DEFAULT_SNDBUF, ZeroCopySender, create_multicast_sender, encode_binary_message, encode_binary_message_into, encode_json_message, send_message, BatchSender, IoUringSender, create_message, create_compact_message, format_timestamp, get_available_interfaces
 
 
 def test_create_multicast_sender():
@@ -20,6 +22,19 @@ def test_create_multicast_sender():
     assert sock.family == socket.AF_INET
     assert sock.type == socket.SOCK_DGRAM
     assert sock.proto == socket.IPPROTO_UDP
+    assert sock.getsockopt(socket.IPPROTO_IP, socket.IP_TOS) == 0xB8
+    assert sock.getsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP) == 1
+    
+    # Clean up
+    sock.close()
+
+
+def test_create_multicast_sender_no_loopback():
+    """Test that multicast loopback and TOS marking can be turned off."""
+    sock = create_multicast_sender("239.0.0.1", 12345, tos=0, loopback=False)
+    
+    assert sock.getsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP) == 0
+    assert sock.getsockopt(socket.IPPROTO_IP, socket.IP_TOS) == 0
     
     # Clean up
     sock.close()
@@ -41,17 +56,176 @@ def test_encode_binary_message():
     binary_data = encode_binary_message(message)
     
     # Verify binary data length
-    assert len(binary_data) == 21  # 8 + 4 + 4 + 4 + 1 bytes
+    assert len(binary_data) == 17  # 8 + 4 + 2 + 2 + 1 bytes
     
     # Decode and verify values
-    send_time, counter, temperature, humidity, status = struct.unpack('!QIffB', binary_data)
+    send_time, counter, temperature, humidity, status = struct.unpack('!QIhhB', binary_data)
     assert send_time == 1234567890
     assert counter == 42
-    assert temperature == 25.5
-    assert humidity == 60.0
+    assert temperature == 255  # tenths
+    assert humidity == 600
     assert status == 1  # active
 
 
+def test_encode_binary_message_int_status():
+    """Test that the integer status of create_message() packs like the status strings."""
+    message = create_message(3)
+    assert message["data"]["status"] == 1
+    encoded = encode_binary_message(message)
+    
+    message["data"]["status"] = "active"
+    assert encode_binary_message(message) == encoded
+    
+    buffer = bytearray(17)
+    message["data"]["status"] = 0
+    encode_binary_message_into(message, buffer)
+    assert buffer[-1] == 0
+    
+    # Invalid codes raise instead of being sent as inactive
+    for status in (256, None):
+        message["data"]["status"] = status
+        with pytest.raises((struct.error, OverflowError, TypeError)):
+            encode_binary_message(message)
+        with pytest.raises((struct.error, OverflowError, TypeError)):
+            encode_binary_message_into(message, buffer)
+
+
+def test_compiled_packer():
+    """Test that the Cython packer, when built, matches struct packing of the tenths."""
+    packer = pytest.importorskip('src._packer')
+    expected = struct.pack('!QIhhB', 1234567890123456789, 42, 255, -600, 1)
+    assert packer.pack_msg(1234567890123456789, 42, 25.5, -60.0, 1) == expected
+    
+    buffer = bytearray(24)
+    assert packer.pack_msg_into(buffer, 4, 1234567890123456789, 42, 25.5, -60.0, 1) == 17
+    assert buffer[4:21] == expected
+    
+    # Values beyond the int16 range of tenths are rejected
+    with pytest.raises(OverflowError):
+        packer.pack_msg(0, 0, 3300.0, 0.0, 1)
+
+
+def test_compiled_send_loop():
+    """Test that the Cython send loop packs messages like encode_binary_message and samples every Nth."""
+    packer = pytest.importorskip('src._packer')
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.connect(receiver.getsockname())
+    
+    sampled = []
+    def sample(message_count):
+        if message_count == 8:
+            raise KeyboardInterrupt
+        sampled.append(message_count)
+        return sock.send(b'sampled')
+    
+    with pytest.raises(KeyboardInterrupt):
+        packer.run_loop(sock.fileno(), None, create_message, None, sample_every=4, sample=sample)
+    
+    assert sampled == [0, 4]
+    for i in range(8):
+        data = receiver.recv(1024)
+        if i % 4 == 0:
+            assert data == b'sampled'
+        else:
+            # Everything but the send time matches the Python encoder
+            assert data[8:] == encode_binary_message(create_message(i))[8:]
+    
+    # Clean up
+    sock.close()
+    receiver.close()
+
+
+def test_get_available_interfaces(monkeypatch):
+    """Test that interfaces are enumerated once and only IPv4 addresses are kept."""
+    fake = MagicMock(AF_INET=2)
+    fake.interfaces.return_value = ['lo', 'eth0', 'wg0']
+    fake.ifaddresses.side_effect = lambda iface: {
+        'lo': {2: [{'addr': '127.0.0.1'}]},
+        'eth0': {2: [{'addr': '192.0.2.10'}, {'addr': '192.0.2.11'}], 10: [{'addr': 'fe80::1'}]},
+        'wg0': {},
+    }[iface]
+    monkeypatch.setattr('src.multicast_producer.netifaces', fake)
+    get_available_interfaces.cache_clear()
+    
+    try:
+        expected = (('lo', '127.0.0.1'), ('eth0', '192.0.2.10'), ('eth0', '192.0.2.11'))
+        assert get_available_interfaces() == expected
+        assert get_available_interfaces() == expected
+        assert fake.interfaces.call_count == 1
+    finally:
+        get_available_interfaces.cache_clear()
+
+
+def test_format_timestamp():
+    """Test that cached ISO timestamps match datetime formatting."""
+    for send_time in (1_710_417_600_000_000_000, 1_710_417_600_123_456_789, 1_710_417_601_999_999_999):
+        expected = datetime.fromtimestamp(send_time // 1000 / 1_000_000).isoformat(timespec='microseconds')
+        assert format_timestamp(send_time) == expected
+
+
+def test_create_message_timestamp():
+    """Test that the human-readable timestamp is only added on request."""
+    assert "timestamp" not in create_message(0)
+    
+    message = create_message(7, include_timestamp=True)
+    assert message["counter"] == 7
+    assert message["timestamp"] == format_timestamp(message["send_time"])
+
+
+def test_create_message_reuse():
+    """Test that refilling a message in place matches creating a new one."""
+    message = create_message(0, include_timestamp=True)
+    data = message["data"]
+    
+    reused = create_message(13, include_timestamp=True, message=message)
+    
+    assert reused is message and reused["data"] is data
+    fresh = create_message(13, include_timestamp=True)
+    for msg in (reused, fresh):
+        del msg["send_time"], msg["timestamp"]
+    assert reused == fresh
+
+
+def test_encode_json_message():
+    """Test that the JSON template matches json.dumps for every message layout."""
+    message = create_message(7)
+    assert encode_json_message(message) == json.dumps(message, separators=(',', ':')).encode()
+    
+    message = create_message(7, include_timestamp=True)
+    assert encode_json_message(message) == json.dumps(message, separators=(',', ':')).encode()
+    
+    compact = create_compact_message(7)
+    assert encode_json_message(compact) == json.dumps(compact, separators=(',', ':')).encode()
+    
+    # Layouts the template does not cover fall back to json.dumps
+    message["data"]["status"] = "inactive"
+    assert json.loads(encode_json_message(message)) == message
+    
+    # Extra or missing keys are not dropped or looked up by the template
+    message = create_message(7)
+    message["data"]["extra"] = "x"
+    assert json.loads(encode_json_message(message)) == message
+    message = create_message(7)
+    del message["counter"]
+    message["other"] = 1
+    assert json.loads(encode_json_message(message)) == message
+    
+    # Values the template would truncate or render as Python reprs fall back too
+    for key, value in (("temperature", "25.5"), ("humidity", None), ("status", 1.0)):
+        message = create_message(7)
+        message["data"][key] = value
+        assert json.loads(encode_json_message(message)) == message
+    message = create_message(7)
+    message["send_time"] = 1.5
+    assert json.loads(encode_json_message(message)) == message
+    compact = create_compact_message(7)
+    compact["t"] = 1.5
+    assert json.loads(encode_json_message(compact)) == compact
+
+
 @patch('socket.socket')
 def test_send_json_message(mock_socket):
     """Test sending a JSON message."""
@@ -62,7 +236,9 @@ def test_send_json_message(mock_socket):
     # Configure the mock socket
     mock_sock = MagicMock()
     mock_socket.return_value = mock_sock
-    mock_sock.sendto.side_effect = socket.error("Mock network error")
+    # Report the requested send buffer as granted (Linux reports double)
+    mock_sock.getsockopt.return_value = 2 * DEFAULT_SNDBUF
+    mock_sock.send.side_effect = socket.error("Mock network error")
     
     sock = create_multicast_sender(group, port, ttl)
     
@@ -95,7 +271,9 @@ def test_send_binary_message(mock_socket):
     # Configure the mock socket
     mock_sock = MagicMock()
     mock_socket.return_value = mock_sock
-    mock_sock.sendto.side_effect = socket.error("Mock network error")
+    # Report the requested send buffer as granted (Linux reports double)
+    mock_sock.getsockopt.return_value = 2 * DEFAULT_SNDBUF
+    mock_sock.send.side_effect = socket.error("Mock network error")
     
     sock = create_multicast_sender(group, port, ttl)
     
@@ -115,4 +293,155 @@ def test_send_binary_message(mock_socket):
         send_message(sock, group, port, message, 'binary')
     
     # Clean up
-    sock.close() 
\ No newline at end of file
+    sock.close() 
+
+
+@patch('socket.socket')
+def test_send_msgpack_message(mock_socket):
+    """Test that a MessagePack message round-trips through send_message."""
+    msgpack = pytest.importorskip('msgpack')
+    group = "239.0.0.1"
+    port = 12345
+    
+    mock_sock = MagicMock()
+    mock_socket.return_value = mock_sock
+    # Report the requested send buffer as granted (Linux reports double)
+    mock_sock.getsockopt.return_value = 2 * DEFAULT_SNDBUF
+    sock = create_multicast_sender(group, port)
+    
+    message = create_message(42)
+    send_message(sock, group, port, message, 'msgpack')
+    
+    mock_sock.connect.assert_called_once_with((group, port))
+    (data,) = mock_sock.send.call_args[0]
+    assert msgpack.unpackb(data, raw=False) == message
+    
+    # Clean up
+    sock.close()
+
+
+@patch('socket.socket')
+def test_send_message_quiet(mock_socket, capsys):
+    """Test that unsampled sends print nothing and report the bytes sent."""
+    mock_sock = MagicMock()
+    mock_socket.return_value = mock_sock
+    # Report the requested send buffer as granted (Linux reports double)
+    mock_sock.getsockopt.return_value = 2 * DEFAULT_SNDBUF
+    sock = create_multicast_sender("239.0.0.1", 12345)
+    
+    sent = send_message(sock, "239.0.0.1", 12345, create_message(1), 'binary', verbose=False)
+    
+    assert sent == struct.calcsize('!QIhhB')
+    mock_sock.send.assert_called_once()
+    assert capsys.readouterr().out == ""
+    
+    # Clean up
+    sock.close()
+
+
+@pytest.mark.parametrize('use_sendmmsg', [True, False])
+def test_batch_sender(use_sendmmsg, monkeypatch):
+    """Test that a batch of payloads arrives as separate datagrams."""
+    if not use_sendmmsg:
+        # Force the portable sendto fallback
+        monkeypatch.setattr('src.multicast_producer._sendmmsg', None)
+    
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    
+    payloads = [b'first', b'second', b'third']
+    sender = BatchSender(sock, *receiver.getsockname(), batch_size=4)
+    sender.send(payloads)
+    
+    assert [receiver.recv(1024) for _ in payloads] == payloads
+    
+    # Batches larger than the configured size are rejected
+    with pytest.raises(ValueError):
+        sender.send([b'x'] * 5)
+    
+    # Messages packed in place arrive exactly as if encoded one by one
+    messages = [create_message(i) for i in range(3)]
+    length = sender.send_encoded(messages, encode_binary_message_into)
+    assert [receiver.recv(1024) for _ in messages] == [encode_binary_message(m) for m in messages]
+    assert length == 3 * 17
+    
+    # Clean up
+    sock.close()
+    receiver.close()
+
+
+def test_batch_sender_fallback_connected(monkeypatch):
+    """Test that the sendmmsg fallback uses send() on a connected socket."""
+    monkeypatch.setattr('src.multicast_producer._sendmmsg', None)
+    mock_sock = MagicMock()
+    mock_sock.getpeername.return_value = ("239.0.0.1", 12345)
+    
+    sender = BatchSender(mock_sock, "239.0.0.1", 12345, batch_size=4)
+    sender.send([b'first', b'second'])
+    sender.send_encoded([create_message(1)], encode_binary_message_into)
+    
+    assert [c.args[0] for c in mock_sock.send.call_args_list[:2]] == [b'first', b'second']
+    assert mock_sock.send.call_count == 3
+    mock_sock.sendto.assert_not_called()
+
+
+def test_zerocopy_sender():
+    """Test that zerocopy sends arrive intact and their payloads are released once complete."""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.connect(receiver.getsockname())
+    
+    try:
+        sender = ZeroCopySender(sock, threshold=1024)
+    except OSError as e:
+        sock.close()
+        receiver.close()
+        pytest.skip(f"MSG_ZEROCOPY not available: {e}")
+    
+    # Only payloads at or above the threshold are sent without a copy and tracked
+    payloads = [b'small', bytes(range(256)) * 8, b'x' * 1024]
+    for payload in payloads:
+        assert sender.send(payload) == len(payload)
+    assert len(sender._pending) <= 2
+    assert [receiver.recv(4096) for _ in payloads] == payloads
+    
+    sender.close()
+    assert not sender._pending
+    
+    # Clean up
+    sock.close()
+    receiver.close()
+
+
+def test_io_uring_sender():
+    """Test that the io_uring sender delivers datagrams and reuses its slots."""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1.0)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    
+    try:
+        sender = IoUringSender(sock, *receiver.getsockname(), slots=4)
+    except OSError as e:
+        sock.close()
+        receiver.close()
+        pytest.skip(f"io_uring not available: {e}")
+    
+    # Send more datagrams than there are slots to exercise slot reuse
+    payloads = [f'message {i}'.encode() for i in range(10)]
+    sender.send(payloads[:6])
+    sender.send(payloads[6:])
+    messages = [create_message(i) for i in range(6)]
+    sender.send_encoded(messages, encode_binary_message_into)
+    sender.close()
+    
+    assert [receiver.recv(2048) for _ in payloads] == payloads
+    assert [receiver.recv(2048) for _ in messages] == [encode_binary_message(m) for m in messages]
+    
+    # Clean up
+    sock.close()
+    receiver.close()